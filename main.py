@@ -14,8 +14,19 @@ from src.logger import Logger
 from src.web import WebPanel
 from src.persistence import StatePersistence
 
+import orjson
 import uvicorn
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import httptools
+except ImportError:
+    httptools = None
+
 class AITrader:
     def __init__(self):
         self.config = config
@@ -59,10 +70,14 @@ class AITrader:
         )
         
         self.mcp_server = MCPServer(self.executor, self.alert_manager)
+        # 工具定义是静态的，只需格式化一次
+        self.llm_tools = self.mcp_server.format_tool_calls_for_llm()
         
         self.agent = TradingAgent(
             api_key=self.config.deepseek_key,
-            system_prompt=self.config.system_prompt
+            system_prompt=self.config.system_prompt,
+            keep_raw_response=self.config.keep_raw_response,
+            max_history_tokens=self.config.max_history_tokens
         )
         
         self.web_panel = WebPanel()
@@ -70,16 +85,42 @@ class AITrader:
         
         self.running = False
         self.price_stream_task = None
+        self.state_flush_task = None
+        self._prefetch_task = None
         self.immediate_decision_needed = False
+        self._state_dirty = False
+        self._web_fp = {}
         
         self.logger.info("AI Trader 初始化完成")
     
     def save_state_callback(self):
-        """状态变化时自动保存"""
-        try:
-            self.persistence.save_state(self.executor, self.cycle_count, self.alert_manager)
-        except Exception as e:
-            self.logger.error(f"自动保存状态失败: {e}")
+        """状态变化时标记待保存，由 state_flush_loop 统一落盘"""
+        self._state_dirty = True
+    
+    async def state_flush_loop(self):
+        """定期保存脏状态，高频价格推送引起的多次状态变化合并为一次写盘"""
+        interval = self.config.state_flush_interval
+        while self.running:
+            await asyncio.sleep(interval)
+            if not self._state_dirty:
+                continue
+            
+            self._state_dirty = False
+            # 预警在事件循环中随价格推送增删，先在循环内取快照，线程只接触这份副本
+            saved = await asyncio.to_thread(
+                self.persistence.save_state, self.executor, self.cycle_count, self.alert_manager.to_dict()
+            )
+            if not saved:
+                self.logger.error("自动保存状态失败")
+                self._state_dirty = True
+    
+    def _web_changed(self, key: str, data) -> bool:
+        """比较面板数据指纹，没有交易发生时相邻周期的数据通常完全相同"""
+        fingerprint = hash(orjson.dumps(data, default=str))
+        if self._web_fp.get(key) == fingerprint:
+            return False
+        self._web_fp[key] = fingerprint
+        return True
     
     def trigger_immediate_decision(self, alert, current_price):
         """价格预警触发，立即执行决策"""
@@ -97,21 +138,21 @@ class AITrader:
             
             if result['triggered_plans']:
                 self.logger.info(f"[实时] 触发 {len(result['triggered_plans'])} 个交易计划 @ ${price:.2f}")
-                for triggered in result['triggered_plans']:
-                    self.logger.log_trade(
-                        "triggered_plan",
-                        {"plan_id": triggered['plan_id'], "trigger_price": price},
-                        triggered['result']
-                    )
+                self.logger.log_trades_bulk([
+                    ("triggered_plan",
+                     {"plan_id": triggered['plan_id'], "trigger_price": price},
+                     triggered['result'])
+                    for triggered in result['triggered_plans']
+                ])
             
             if result['auto_closed_positions']:
                 self.logger.info(f"[实时] 自动平仓 {len(result['auto_closed_positions'])} 个仓位 @ ${price:.2f}")
-                for closed in result['auto_closed_positions']:
-                    self.logger.log_trade(
-                        f"auto_close_{closed['trigger']}",
-                        {"position_id": closed['position_id'], "close_price": price},
-                        closed['result']
-                    )
+                self.logger.log_trades_bulk([
+                    (f"auto_close_{closed['trigger']}",
+                     {"position_id": closed['position_id'], "close_price": price},
+                     closed['result'])
+                    for closed in result['auto_closed_positions']
+                ])
         except Exception as e:
             self.logger.error(f"价格更新回调错误: {e}")
     
@@ -119,6 +160,78 @@ class AITrader:
         """启动交易计划监控线程 (已被实时价格推送取代)"""
         pass
     
+    def _collect_market_data_async(self):
+        return asyncio.to_thread(
+            self.collector.collect_market_data,
+            self.config.symbol.replace('_', '/')
+        )
+    
+    async def fetch_market_data(self) -> dict:
+        """获取市场数据，优先使用上一轮与LLM调用并行预取的结果"""
+        task, self._prefetch_task = self._prefetch_task, None
+        if task is not None:
+            market_data = await task
+            timestamp = market_data.get('timestamp')
+            if timestamp:
+                age = (datetime.now() - datetime.fromisoformat(timestamp)).total_seconds()
+                if age <= self.config.prefetch_max_age:
+                    return market_data
+        
+        return await self._collect_market_data_async()
+    
+    def prefetch_market_data(self):
+        """在等待LLM响应期间预取下一轮市场数据
+        
+        只有在周期间隔足够短、预取结果到下一轮仍然新鲜时才预取，
+        否则会白白多一次交易所请求。
+        """
+        if self._prefetch_task is None and self.config.loop_interval < self.config.prefetch_max_age:
+            self._prefetch_task = asyncio.create_task(self._collect_market_data_async())
+    
+    async def execute_tool_call(self, tool_call: dict) -> dict:
+        """执行Agent返回的单个工具调用
+        
+        由流式响应在参数完整时调度为任务。处理函数在任务首次await之前同步执行，
+        因此工具仍按返回顺序生效（后一个调用可能依赖前一个调用释放的保证金）。
+        """
+        if 'error' in tool_call:
+            self.logger.error(f"工具调用错误: {tool_call['error']}")
+            return tool_call
+        
+        result = self.mcp_server.handle_tool_call(
+            tool_call['name'],
+            tool_call['arguments']
+        )
+        
+        if tool_call['name'] == 'set_price_alert' and result.get('success'):
+            alert_data = result.get('alert_data', {})
+            alert_id = self.alert_manager.create_alert(
+                price=alert_data['price'],
+                condition=alert_data['condition'],
+                callback=self.trigger_immediate_decision,
+                description=alert_data.get('description', '')
+            )
+            result['alert_id'] = alert_id
+            self.logger.info(f"价格预警已设置: {alert_data['condition']} ${alert_data['price']:.2f}")
+            self._state_dirty = True
+        
+        if tool_call['name'] == 'cancel_price_alert' and result.get('success'):
+            self.logger.info(f"价格预警已取消: {tool_call['arguments'].get('alert_id')}")
+            self._state_dirty = True
+        
+        self.logger.info(f"工具 {tool_call['name']} 结果: {result}")
+        self.logger.log_trade(
+            tool_call['name'],
+            tool_call['arguments'],
+            result
+        )
+        
+        return {
+            "tool": tool_call['name'],
+            "arguments": tool_call['arguments'],
+            "result": result
+        }
+    
     async def main_loop(self):
         """主决策循环"""
         self.logger.info("主循环启动")
@@ -127,12 +240,14 @@ class AITrader:
         self.price_stream_task = asyncio.create_task(self.price_stream.start())
         self.logger.info("实时价格推送已启动")
         
+        self.state_flush_task = asyncio.create_task(self.state_flush_loop())
+        
         await asyncio.sleep(2)
         
         while self.running:
             try:
                 self.cycle_count += 1
-                cycle_start = time.time()
+                cycle_start = time.perf_counter_ns()
                 
                 self.logger.info(f"===== 周期 {self.cycle_count} =====")
                 
@@ -142,9 +257,7 @@ class AITrader:
                     last_decision_time=datetime.now().isoformat()
                 )
                 
-                market_data = self.collector.collect_market_data(
-                    self.config.symbol.replace('_', '/')
-                )
+                market_data = await self.fetch_market_data()
                 
                 if "error" in market_data:
                     self.logger.error(f"获取市场数据失败: {market_data['error']}")
@@ -170,81 +283,59 @@ class AITrader:
                 plans = self.executor.get_plans()
                 alerts = self.alert_manager.get_active_alerts()
                 
-                self.web_panel.update_account(account_info)
-                self.web_panel.update_positions(positions)
-                self.web_panel.update_plans(plans)
-                self.web_panel.update_price_alerts(alerts)
+                if self._web_changed("account", account_info):
+                    self.web_panel.update_account(account_info)
+                if self._web_changed("positions", positions):
+                    self.web_panel.update_positions(positions)
+                if self._web_changed("plans", plans):
+                    self.web_panel.update_plans(plans)
+                if self._web_changed("alerts", alerts):
+                    self.web_panel.update_price_alerts(alerts)
                 
-                formatted_info = self.collector.format_data_for_agent(
+                formatted_info = await asyncio.to_thread(
+                    self.collector.format_data_for_agent,
                     market_data, account_info, positions, plans, alerts
                 )
                 
                 self.logger.debug(f"市场信息:\n{formatted_info}")
                 
-                tools = self.mcp_server.format_tool_calls_for_llm()
-                
                 execution_feedback = None
                 max_retries = 2
+                execution_results = []
                 
                 for retry in range(max_retries):
-                    decision = self.agent.make_decision(formatted_info, tools, current_price, execution_feedback)
+                    self.prefetch_market_data()
+                    tool_tasks = []
+                    decision = await self.agent.make_decision(
+                        formatted_info, self.llm_tools, current_price, execution_feedback,
+                        on_tool_call=lambda tool_call: tool_tasks.append(
+                            asyncio.create_task(self.execute_tool_call(tool_call))
+                        )
+                    )
+                    tool_results = list(await asyncio.gather(*tool_tasks))
                     
                     if "error" in decision:
                         self.logger.error(f"Agent决策失败: {decision['error']}")
+                        if tool_results:
+                            # 响应中断前已有工具调用执行完成，按部分决策记录；不再用旧的账户状态重试，避免重复下单
+                            execution_results = tool_results
+                            self.logger.warning(f"响应中断前已执行 {len(tool_results)} 个工具调用，记录为部分决策")
+                            break
                         await asyncio.sleep(self.config.loop_interval)
                         continue
                     
                     self.logger.info(f"Agent分析: {decision['analysis']}")
                     
-                    execution_results = []
+                    execution_results = tool_results
                     has_error = False
                     
                     if decision['tool_calls']:
-                        self.logger.info(f"执行 {len(decision['tool_calls'])} 个工具调用")
+                        self.logger.info(f"已执行 {len(decision['tool_calls'])} 个工具调用")
                         
-                        for tool_call in decision['tool_calls']:
-                            if 'error' in tool_call:
-                                self.logger.error(f"工具调用错误: {tool_call['error']}")
-                                execution_results.append(tool_call)
-                                continue
-                            
-                            result = self.mcp_server.handle_tool_call(
-                                tool_call['name'],
-                                tool_call['arguments']
-                            )
-                            
-                            if tool_call['name'] == 'set_price_alert' and result.get('success'):
-                                alert_data = result.get('alert_data', {})
-                                alert_id = self.alert_manager.create_alert(
-                                    price=alert_data['price'],
-                                    condition=alert_data['condition'],
-                                    callback=self.trigger_immediate_decision,
-                                    description=alert_data.get('description', '')
-                                )
-                                result['alert_id'] = alert_id
-                                self.logger.info(f"价格预警已设置: {alert_data['condition']} ${alert_data['price']:.2f}")
-                                
-                                self.persistence.save_state(self.executor, self.cycle_count, self.alert_manager)
-                            
-                            if tool_call['name'] == 'cancel_price_alert' and result.get('success'):
-                                self.logger.info(f"价格预警已取消: {tool_call['arguments'].get('alert_id')}")
-                                self.persistence.save_state(self.executor, self.cycle_count, self.alert_manager)
-                            
-                            self.logger.info(f"工具 {tool_call['name']} 结果: {result}")
-                            self.logger.log_trade(
-                                tool_call['name'],
-                                tool_call['arguments'],
-                                result
-                            )
-                            
-                            execution_results.append({
-                                "tool": tool_call['name'],
-                                "arguments": tool_call['arguments'],
-                                "result": result
-                            })
-                            
-                            if not result.get('success', False):
-                                has_error = True
+                        has_error = any(
+                            'result' in exec_result and not exec_result['result'].get('success', False)
+                            for exec_result in execution_results
+                        )
                         
                         if has_error and retry < max_retries - 1:
                             error_messages = []
@@ -272,7 +363,7 @@ class AITrader:
                     "execution_results": execution_results
                 })
                 
-                cycle_duration = (time.time() - cycle_start) * 1000
+                cycle_duration = (time.perf_counter_ns() - cycle_start) / 1_000_000
                 
                 self.logger.log_decision(
                     cycle=self.cycle_count,
@@ -294,9 +385,8 @@ class AITrader:
                 if last_price:
                     self.logger.debug(f"实时价格: ${last_price:.2f} (更新于 {update_age:.1f}秒前)")
                 
-                if self.cycle_count % 10 == 0:
-                    self.persistence.save_state(self.executor, self.cycle_count, self.alert_manager)
-                    self.logger.info(f"状态已保存 (周期 {self.cycle_count})")
+                # 周期数已推进，交给 state_flush_loop 保存
+                self._state_dirty = True
                 
                 # 检查是否需要立即决策
                 if self.immediate_decision_needed:
@@ -326,7 +416,15 @@ class AITrader:
                     self.web_panel.app,
                     host="0.0.0.0",
                     port=8000,
-                    log_level="error"
+                    log_level="error",
+                    access_log=False,
+                    loop="uvloop" if uvloop else "asyncio",
+                    http="httptools" if httptools else "h11",
+                    # 面板页面只接收不发送，靠协议层 ping/pong 发现失联的客户端
+                    ws_ping_interval=20.0,
+                    ws_ping_timeout=20.0,
+                    # 面板推送是重复键很多的JSON，协商 permessage-deflate 后按帧压缩
+                    ws_per_message_deflate=True
                 )
                 server = uvicorn.Server(web_config)
                 
@@ -344,8 +442,17 @@ class AITrader:
                         except asyncio.CancelledError:
                             pass
                     
+                    if self.state_flush_task and not self.state_flush_task.done():
+                        self.state_flush_task.cancel()
+                        try:
+                            await self.state_flush_task
+                        except asyncio.CancelledError:
+                            pass
+                    
+                    await self.agent.close()
+                    
                     self.logger.info("保存最终状态...")
-                    self.persistence.save_state(self.executor, self.cycle_count, self.alert_manager)
+                    self.persistence.save_state(self.executor, self.cycle_count, self.alert_manager.to_dict())
                     
                     self.logger.info("停止Web服务器...")
                     await server.shutdown()
@@ -364,12 +471,17 @@ class AITrader:
                     self.logger.info("任务被取消")
                     await shutdown_handler()
             
-            asyncio.run(run_app())
+            if uvloop:
+                uvloop.run(run_app())
+            else:
+                asyncio.run(run_app())
         
         except KeyboardInterrupt:
             self.logger.info("系统已停止")
         except Exception as e:
             self.logger.error(f"系统错误: {e}", exc_info=True)
+        finally:
+            self.logger.close()
 
 def main():
     trader = AITrader()
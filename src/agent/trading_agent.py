@@ -1,20 +1,43 @@
-from openai import OpenAI
-import json
-from typing import Dict, List, Optional
+from openai import AsyncOpenAI
+import httpx
+import orjson
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
 from datetime import datetime
 
+try:
+    import h2
+except ImportError:
+    h2 = None
+
 class TradingAgent:
-    def __init__(self, api_key: str, system_prompt: str, model: str = "deepseek-chat"):
-        self.client = OpenAI(
+    def __init__(self, api_key: str, system_prompt: str, model: str = "deepseek-chat",
+                 max_history_messages: int = 12, keep_raw_response: bool = False,
+                 max_history_tokens: int = 16000):
+        # 长连接复用TLS会话；安装了h2时走HTTP/2，并发请求可在同一连接上多路复用
+        self.http_client = httpx.AsyncClient(
+            http2=h2 is not None,
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=300),
+            timeout=httpx.Timeout(600.0, connect=5.0)
+        )
+        self.client = AsyncOpenAI(
             api_key=api_key,
-            base_url="https://api.deepseek.com"
+            base_url="https://api.deepseek.com",
+            http_client=self.http_client
         )
         self.model = model
         self.system_prompt = system_prompt
-        self.conversation_history = []
+        self.max_history_messages = max_history_messages
+        # 原始响应只用于调试，且与 analysis/tool_calls 内容重复，默认不保留，避免每轮额外构造并写入决策日志
+        self.keep_raw_response = keep_raw_response
+        self.conversation_history = deque(maxlen=max_history_messages)
+        # 与 conversation_history 一一对应的token估算，避免每轮重新计算
+        self.max_history_tokens = max_history_tokens
+        self._history_tokens = deque(maxlen=max_history_messages)
     
-    def make_decision(self, market_info: str, tools: List[Dict], current_price: float, 
-                     execution_feedback: Optional[str] = None) -> Dict:
+    async def make_decision(self, market_info: str, tools: Sequence[Dict], current_price: float, 
+                           execution_feedback: Optional[str] = None,
+                           on_tool_call: Optional[Callable[[Dict], None]] = None) -> Dict:
         """
         让Agent做出交易决策
         
@@ -23,21 +46,31 @@ class TradingAgent:
             tools: 可用工具列表（OpenAI function calling格式）
             current_price: 当前价格（用于工具调用）
             execution_feedback: 上次执行的反馈（如果有错误）
+            on_tool_call: 流式响应中每个工具调用参数完整时立即回调，无需等待整个响应结束
         
         Returns:
             {
                 "analysis": "市场分析文本",
                 "tool_calls": [{"name": "tool_name", "arguments": {...}}],
-                "raw_response": "原始响应"
+                "raw_response": "原始响应（仅 keep_raw_response 时保留，否则为 None）"
             }
+            出错时额外带 "error"，tool_calls 中保留出错前已经回调执行的工具调用
         """
+        content_parts = []
+        partial_calls: Dict[int, Dict] = {}
+        result = {
+            "analysis": "",
+            "tool_calls": [],
+            "raw_response": None
+        }
+        
         try:
             messages = [
                 {"role": "system", "content": self.system_prompt}
             ]
             
-            if len(self.conversation_history) > 0:
-                messages.extend(self.conversation_history[-6:])
+            # 历史从头完整传入：两次裁剪之间请求前缀逐字节不变，可以命中DeepSeek的上下文硬盘缓存
+            messages.extend(self.conversation_history)
             
             user_message = market_info
             if execution_feedback:
@@ -45,60 +78,150 @@ class TradingAgent:
             
             messages.append({"role": "user", "content": user_message})
             
-            response = self.client.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 tools=tools,
                 tool_choice="auto",
-                temperature=0.7
+                temperature=0.7,
+                stream=True
             )
             
-            message = response.choices[0].message
+            def emit(index: int):
+                call = partial_calls[index]
+                if call["emitted"]:
+                    return
+                call["emitted"] = True
+                tool_call = self._parse_tool_call(call, current_price)
+                result["tool_calls"].append(tool_call)
+                if on_tool_call:
+                    on_tool_call(tool_call)
             
-            result = {
-                "analysis": message.content or "",
-                "tool_calls": [],
-                "raw_response": message.model_dump()
-            }
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                
+                if delta.content:
+                    content_parts.append(delta.content)
+                
+                for tc_delta in delta.tool_calls or []:
+                    if tc_delta.index not in partial_calls:
+                        # 新的工具调用开始，之前的调用参数已经完整
+                        for index in partial_calls:
+                            emit(index)
+                        partial_calls[tc_delta.index] = {
+                            "id": "", "name": "", "arguments": "", "emitted": False
+                        }
+                    
+                    call = partial_calls[tc_delta.index]
+                    if tc_delta.id:
+                        call["id"] = tc_delta.id
+                    if tc_delta.function:
+                        if tc_delta.function.name:
+                            call["name"] += tc_delta.function.name
+                        if tc_delta.function.arguments:
+                            call["arguments"] += tc_delta.function.arguments
+                            # 参数是JSON对象，以 } 结尾且能解析时即可提前执行
+                            if call["arguments"].rstrip().endswith("}"):
+                                try:
+                                    orjson.loads(call["arguments"])
+                                except orjson.JSONDecodeError:
+                                    pass
+                                else:
+                                    emit(tc_delta.index)
             
-            if message.tool_calls:
-                for tool_call in message.tool_calls:
-                    try:
-                        arguments = json.loads(tool_call.function.arguments)
-                        
-                        if tool_call.function.name in ["open_position", "close_position"]:
-                            arguments["current_price"] = current_price
-                        
-                        result["tool_calls"].append({
-                            "id": tool_call.id,
-                            "name": tool_call.function.name,
-                            "arguments": arguments
-                        })
-                    except json.JSONDecodeError as e:
-                        result["tool_calls"].append({
-                            "error": f"解析工具参数失败: {e}",
-                            "raw_arguments": tool_call.function.arguments
-                        })
+            for index in partial_calls:
+                emit(index)
             
-            self.conversation_history.append({"role": "user", "content": user_message})
-            self.conversation_history.append({"role": "assistant", "content": message.content or ""})
+            analysis = "".join(content_parts)
+            result["analysis"] = analysis
+            if self.keep_raw_response:
+                result["raw_response"] = {
+                    "role": "assistant",
+                    "content": analysis,
+                    "tool_calls": [
+                        {
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": call["arguments"]}
+                        }
+                        for call in partial_calls.values()
+                    ]
+                }
             
-            if len(self.conversation_history) > 20:
-                self.conversation_history = self.conversation_history[-20:]
+            self._append_round(user_message, analysis)
             
             return result
         
         except Exception as e:
+            # 流式响应中途失败时，已回调执行的工具调用也一并返回，调用方据此记录部分决策
             return {
-                "analysis": "",
-                "tool_calls": [],
+                "analysis": "".join(content_parts),
+                "tool_calls": result["tool_calls"],
                 "error": str(e),
                 "raw_response": None
             }
     
+    async def close(self):
+        """关闭底层HTTP连接池"""
+        await self.http_client.aclose()
+    
+    def _parse_tool_call(self, call: Dict, current_price: float) -> Dict:
+        """把流式拼接完成的工具调用解析为执行格式"""
+        try:
+            arguments = orjson.loads(call["arguments"] or "{}")
+            
+            if call["name"] in ["open_position", "close_position"]:
+                arguments["current_price"] = current_price
+            
+            return {
+                "id": call["id"],
+                "name": call["name"],
+                "arguments": arguments
+            }
+        except orjson.JSONDecodeError as e:
+            return {
+                "error": f"解析工具参数失败: {e}",
+                "raw_arguments": call["arguments"]
+            }
+    
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """粗略估算token数：按UTF-8字节数/4，中文约0.75 token/字，英文约1 token/4字符"""
+        return len(text.encode('utf-8')) // 4 + 1
+    
+    def _append_round(self, user_message: str, assistant_message: str):
+        """追加一轮对话
+        
+        消息条数或估算token数超出上限时，一次性丢弃较早的历史，直到条数和token都降到上限的一半，
+        而不是每轮滑动窗口，这样只有裁剪的那一轮会使缓存前缀失效。
+        单条市场快照过大时也不会让预填充开销失控。
+        """
+        new_tokens = self._estimate_tokens(user_message) + self._estimate_tokens(assistant_message)
+        
+        if (len(self.conversation_history) + 2 > self.max_history_messages
+                or sum(self._history_tokens) + new_tokens > self.max_history_tokens):
+            keep = self.max_history_messages // 2
+            token_budget = self.max_history_tokens // 2
+            while self.conversation_history and (
+                    len(self.conversation_history) > keep
+                    or sum(self._history_tokens) + new_tokens > token_budget):
+                # 按轮（user+assistant）成对丢弃，保证历史总是从user消息开始
+                for _ in range(min(2, len(self.conversation_history))):
+                    self.conversation_history.popleft()
+                    self._history_tokens.popleft()
+        
+        self._append_message({"role": "user", "content": user_message})
+        self._append_message({"role": "assistant", "content": assistant_message})
+    
+    def _append_message(self, message: Dict):
+        self.conversation_history.append(message)
+        self._history_tokens.append(self._estimate_tokens(message["content"]))
+    
     def add_to_history(self, role: str, content: str):
         """添加到对话历史"""
-        self.conversation_history.append({
+        self._append_message({
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat()
@@ -106,8 +229,9 @@ class TradingAgent:
     
     def get_history(self, limit: int = 50) -> List[Dict]:
         """获取对话历史"""
-        return self.conversation_history[-limit:]
+        return list(self.conversation_history)[-limit:]
     
     def clear_history(self):
         """清空对话历史"""
-        self.conversation_history = []
\ No newline at end of file
+        self.conversation_history.clear()
+        self._history_tokens.clear()
\ No newline at end of file
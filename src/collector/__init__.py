@@ -1,6 +1,24 @@
-from .market_data import DataCollector, IndicatorCalculator, MarketDataCollector
-from .price_stream import PriceStreamManager
-from .price_alert import PriceAlertManager
+import importlib
 
-__all__ = ['DataCollector', 'IndicatorCalculator', 'MarketDataCollector', 
-           'PriceStreamManager', 'PriceAlertManager']
\ No newline at end of file
+# 按需加载：market_data 会引入 ccxt/pandas/numpy，只用价格预警或推送时不必付出这部分导入开销
+_lazy = {
+    'DataCollector': 'market_data',
+    'IndicatorCalculator': 'market_data',
+    'MarketDataCollector': 'market_data',
+    'PriceStreamManager': 'price_stream',
+    'PriceAlertManager': 'price_alert',
+}
+
+__all__ = ['DataCollector', 'IndicatorCalculator', 'MarketDataCollector',
+           'PriceStreamManager', 'PriceAlertManager']
+
+def __getattr__(name):
+    if name in _lazy:
+        module = importlib.import_module('.' + _lazy[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,22 @@
+"""numba 可选依赖的兼容层
+
+安装了 numba 时指标内核按 nopython 模式编译；未安装时 njit 退化为原样返回函数的装饰器，
+内核仍以纯 Python + NumPy 运行，结果一致，只是速度较慢。
+"""
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        # 同时支持 @njit 和 @njit(cache=True, ...) 两种写法
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
+
+__all__ = ['njit', 'NUMBA_AVAILABLE']
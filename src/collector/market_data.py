@@ -1,12 +1,21 @@
 import ccxt
 import pandas as pd
 import numpy as np
+from ._njit import njit
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-import json
+import copy
+import orjson
 import os
+import threading
 import time
 
+try:
+    import pyarrow  # pandas 读写 feather 需要
+except ImportError:
+    pyarrow = None
+
 class DataCollector:
     def __init__(self, exchange_id: str = 'gate', api_key: str = '', api_secret: str = '',
                  cache_dir: str = 'data/cache', cache_ttl: int = 86400):
@@ -19,11 +28,29 @@ class DataCollector:
             exchange_config['apiKey'] = api_key
             exchange_config['secret'] = api_secret
         
-        self.exchange = getattr(ccxt, exchange_id)(exchange_config)
+        # ccxt 交易所实例的限流计时、last_request_* 字段和HTTP会话都不是线程安全的，
+        # 各周期的工作线程并发拉取K线，每个线程各自持有一个实例，见 exchange 属性
+        self._exchange_class = getattr(ccxt, exchange_id)
+        self._exchange_config = exchange_config
+        self._local = threading.local()
         
         self.cache_dir = cache_dir
         self.cache_ttl = cache_ttl
         os.makedirs(cache_dir, exist_ok=True)
+        
+        # (symbol, timeframe) -> 上次拉取的K线，之后只增量拉取最新的几根
+        self._frames: Dict[tuple, pd.DataFrame] = {}
+        # 缓存只在拉取失败时才读，写盘放到后台单线程，不占用行情获取的耗时
+        self._cache_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ohlcv-cache')
+    
+    @property
+    def exchange(self):
+        """当前线程专用的交易所实例，首次使用时创建"""
+        exchange = getattr(self._local, 'exchange', None)
+        if exchange is None:
+            exchange = self._exchange_class(copy.deepcopy(self._exchange_config))
+            self._local.exchange = exchange
+        return exchange
     
     def get_current_price(self, symbol: str) -> Optional[float]:
         try:
@@ -33,114 +60,558 @@ class DataCollector:
             print(f"获取当前价格失败: {e}")
             return None
     
+    def _cache_file(self, symbol: str, timeframe: str) -> str:
+        # 有 pyarrow 时用 feather 列式二进制缓存，一次写入无需逐行转换；否则退回JSON
+        ext = 'feather' if pyarrow is not None else 'json'
+        return os.path.join(self.cache_dir, f"{symbol.replace('/', '_')}_{timeframe}.{ext}")
+    
+    def _write_cache(self, cache_file: str, df: pd.DataFrame):
+        # 先写临时文件再替换，拉取失败时读到的总是完整的缓存
+        tmp_file = cache_file + '.tmp'
+        try:
+            if pyarrow is not None:
+                df.to_feather(tmp_file)
+            else:
+                # pd.Timestamp 不是 orjson 原生支持的 datetime，由 default 转为ISO字符串
+                with open(tmp_file, 'wb') as f:
+                    f.write(orjson.dumps(df.to_dict('records'), default=pd.Timestamp.isoformat,
+                                         option=orjson.OPT_SERIALIZE_NUMPY))
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            print(f"写入K线缓存失败 {cache_file}: {e}")
+    
+    def _read_cache(self, cache_file: str) -> pd.DataFrame:
+        if pyarrow is not None:
+            return pd.read_feather(cache_file)
+        
+        with open(cache_file, 'rb') as f:
+            df = pd.DataFrame(orjson.loads(f.read()))
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        return df
+    
+    @staticmethod
+    def _to_frame(ohlcv: list) -> pd.DataFrame:
+        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+    
+    def _fetch_incremental(self, symbol: str, timeframe: str, limit: int) -> Optional[pd.DataFrame]:
+        """从上次最后一根（未收盘）K线开始拉取，拼接到已有数据后面
+        
+        只有接不上（数据不足、出现缺口）时返回None，由调用方整段重新拉取；
+        两次拉取间隔超过 limit 根K线时，本次只能拿到从旧数据末尾起的 limit 根，同样返回None。
+        """
+        previous = self._frames.get((symbol, timeframe))
+        if previous is None or len(previous) < limit:
+            return None
+        
+        last_timestamp = previous['timestamp'].iloc[-1]
+        since = last_timestamp.value // 1_000_000
+        new = self._to_frame(self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit))
+        
+        if new.empty or new['timestamp'].iloc[0] != last_timestamp:
+            return None
+        
+        # 拉满 limit 根说明后面可能还有；最后一根的开盘时间早于当前两个周期以上（留一个周期容忍新K线尚未生成），
+        # 说明中间还有已收盘的K线没拉到
+        timeframe_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        newest_ms = new['timestamp'].iloc[-1].value // 1_000_000
+        if len(new) >= limit or time.time() * 1000 - newest_ms > timeframe_ms * 2:
+            return None
+        
+        # 上一次的最后一根会被新数据中的同一时间戳K线覆盖
+        df = pd.concat([previous.iloc[:-1], new], ignore_index=True)
+        return df.iloc[-limit:].reset_index(drop=True)
+    
     def get_ohlcv(self, symbol: str, timeframe: str, limit: int = 200) -> Optional[pd.DataFrame]:
-        cache_file = os.path.join(self.cache_dir, f"{symbol.replace('/', '_')}_{timeframe}.json")
+        cache_file = self._cache_file(symbol, timeframe)
         
         try:
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            
-            if len(df) < limit * 0.8:
-                print(f"警告: {symbol} {timeframe} 只获取到 {len(df)}/{limit} 条数据")
-            
-            cache_data = df.to_dict('records')
-            for item in cache_data:
-                item['timestamp'] = item['timestamp'].isoformat()
+            df = self._fetch_incremental(symbol, timeframe, limit)
+            if df is None:
+                df = self._to_frame(self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit))
+                
+                if len(df) < limit * 0.8:
+                    print(f"警告: {symbol} {timeframe} 只获取到 {len(df)}/{limit} 条数据")
             
-            with open(cache_file, 'w') as f:
-                json.dump(cache_data, f)
-            
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            self._frames[(symbol, timeframe)] = df
+            self._cache_pool.submit(self._write_cache, cache_file, df)
             return df
         except Exception as e:
             print(f"获取K线数据失败 {symbol} {timeframe}: {e}")
+            # 内存中的K线已不连续，恢复后整段重新拉取
+            self._frames.pop((symbol, timeframe), None)
             
             if os.path.exists(cache_file):
                 try:
                     print(f"尝试使用缓存数据 {cache_file}")
-                    with open(cache_file, 'r') as f:
-                        data = json.load(f)
-                        df = pd.DataFrame(data)
-                        df['timestamp'] = pd.to_datetime(df['timestamp'])
-                        print(f"从缓存加载 {len(df)} 条数据")
-                        return df
+                    df = self._read_cache(cache_file)
+                    print(f"从缓存加载 {len(df)} 条数据")
+                    return df
                 except Exception as cache_error:
                     print(f"读取缓存失败: {cache_error}")
             
             return None
 
+# 内核均带显式类型签名：导入模块时即按签名编译（cache=True 时直接加载磁盘缓存），
+# 首个交易周期不再承担JIT编译延迟，参数类型不符时也会立即报错而不是另编译一份
+@njit('float64[::1](float64[::1], float64)', cache=True, nogil=True)
+def _ewm_mean(values, alpha):
+    """与 pandas ewm(alpha=..., adjust=False).mean() 等价的递推EMA，含NaN处理"""
+    n = values.shape[0]
+    out = np.empty(n)
+    if n == 0:
+        return out
+    
+    weighted = values[0]
+    out[0] = weighted
+    old_wt_factor = 1.0 - alpha
+    old_wt = 1.0
+    
+    for i in range(1, n):
+        cur = values[i]
+        is_observation = cur == cur
+        
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif is_observation:
+            weighted = cur
+        
+        out[i] = weighted
+    
+    return out
+
+@njit('float64[:, ::1](float64[::1], float64[::1])', cache=True, nogil=True)
+def _ema_bank(values, alphas):
+    """一次遍历同时递推多条EMA，每条与 _ewm_mean 的结果相同，返回形状 (len(alphas), n)"""
+    n = values.shape[0]
+    k = alphas.shape[0]
+    out = np.empty((k, n))
+    if n == 0:
+        return out
+    
+    weighted = np.full(k, values[0])
+    old_wt = np.ones(k)
+    out[:, 0] = weighted
+    
+    for i in range(1, n):
+        cur = values[i]
+        is_observation = cur == cur
+        for j in range(k):
+            if weighted[j] == weighted[j]:
+                old_wt[j] *= 1.0 - alphas[j]
+                if is_observation:
+                    if weighted[j] != cur:
+                        weighted[j] = (old_wt[j] * weighted[j] + alphas[j] * cur) / (old_wt[j] + alphas[j])
+                    old_wt[j] = 1.0
+            elif is_observation:
+                weighted[j] = cur
+            out[j, i] = weighted[j]
+    
+    return out
+
+@njit('float64[::1](float64[::1], int64)', cache=True, nogil=True)
+def _rsi(close, period):
+    """一次遍历同时累计涨跌幅的滑动窗口和，计算RSI"""
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    gain_sum = 0.0
+    loss_sum = 0.0
+    gains = np.zeros(n)
+    losses = np.zeros(n)
+    
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        if delta > 0:
+            gains[i] = delta
+        elif delta < 0:
+            losses[i] = -delta
+    
+    for i in range(n):
+        gain_sum += gains[i]
+        loss_sum += losses[i]
+        if i >= period:
+            gain_sum -= gains[i - period]
+            loss_sum -= losses[i - period]
+        if i >= period - 1:
+            if loss_sum == 0.0:
+                out[i] = 100.0 if gain_sum > 0.0 else np.nan
+            else:
+                out[i] = 100.0 - 100.0 / (1.0 + gain_sum / loss_sum)
+    
+    return out
+
+@njit('float64[::1](float64[::1], int64)', cache=True, nogil=True)
+def _rolling_sum(values, window):
+    """与 pandas rolling(window).sum() 一致：窗口内有NaN时结果为NaN"""
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    total = 0.0
+    nobs = 0
+    
+    for i in range(n):
+        value = values[i]
+        if value == value:
+            total += value
+            nobs += 1
+        if i >= window:
+            old = values[i - window]
+            if old == old:
+                total -= old
+                nobs -= 1
+        if i >= window - 1 and nobs == window:
+            out[i] = total
+    
+    return out
+
+@njit('float64[::1](float64[::1], int64)', cache=True, nogil=True)
+def _rolling_std(values, window):
+    """与 pandas rolling(window).std() 一致（ddof=1）
+    
+    按 Welford 算法在窗口滑动时增量加入/移出样本，每根K线O(1)，
+    比 sum/sumsq 相减的写法在大价格数值下更稳定。
+    """
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    if window < 2:
+        return out
+    
+    nobs = 0
+    mean = 0.0
+    m2 = 0.0
+    same_count = 0
+    prev = np.nan
+    
+    for i in range(n):
+        value = values[i]
+        if value == value:
+            nobs += 1
+            delta = value - mean
+            mean += delta / nobs
+            m2 += delta * (value - mean)
+            same_count = same_count + 1 if value == prev else 1
+            prev = value
+        
+        if i >= window:
+            old = values[i - window]
+            if old == old:
+                nobs -= 1
+                if nobs == 0:
+                    mean = 0.0
+                    m2 = 0.0
+                else:
+                    delta = old - mean
+                    mean -= delta / nobs
+                    m2 -= delta * (old - mean)
+        
+        if i >= window - 1 and nobs == window:
+            # 窗口内全为同一数值时直接给0，避免浮点残差
+            if same_count >= nobs:
+                out[i] = 0.0
+            else:
+                out[i] = np.sqrt(max(m2, 0.0) / (nobs - 1))
+    
+    return out
+
+@njit('float64[::1](float64[::1], int64, boolean)', cache=True, nogil=True)
+def _rolling_extrema(values, window, use_max):
+    """与 pandas rolling(window).min()/.max() 一致"""
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    
+    for i in range(window - 1, n):
+        best = values[i]
+        valid = best == best
+        for j in range(i - window + 1, i):
+            value = values[j]
+            if value != value:
+                valid = False
+                break
+            if (use_max and value > best) or (not use_max and value < best):
+                best = value
+        if valid:
+            out[i] = best
+    
+    return out
+
+@njit('UniTuple(float64[::1], 3)(float64[::1], int64, float64)', cache=True, nogil=True)
+def _bollinger(close, period, num_std):
+    """布林带中轨/上轨/下轨"""
+    middle = _rolling_sum(close, period) / period
+    band = _rolling_std(close, period) * num_std
+    return middle, middle + band, middle - band
+
+@njit('UniTuple(float64[::1], 2)(float64[::1], float64[::1], float64[::1], float64[::1])', cache=True, nogil=True, error_model='numpy')
+def _bollinger_bandwidth(close, middle, upper, lower):
+    """由已算好的布林带得到带宽和价格位置(%)"""
+    return ((upper - lower) / middle) * 100, ((close - lower) / (upper - lower)) * 100
+
+@njit('UniTuple(float64[::1], 3)(float64[::1], float64[::1], float64[::1], int64)', cache=True, nogil=True, error_model='numpy')
+def _kdj(high, low, close, period):
+    low_min = _rolling_extrema(low, period, False)
+    high_max = _rolling_extrema(high, period, True)
+    rsv = (close - low_min) / (high_max - low_min) * 100
+    k = _ewm_mean(rsv, 1.0 / 3)
+    d = _ewm_mean(k, 1.0 / 3)
+    return k, d, 3 * k - 2 * d
+
+@njit('float64[::1](float64[::1], float64[::1], float64[::1])', cache=True, nogil=True)
+def _true_range(high, low, close):
+    """真实波幅，三项取最大值时跳过NaN（同 pandas max(axis=1)）"""
+    n = high.shape[0]
+    out = np.empty(n)
+    
+    for i in range(n):
+        best = high[i] - low[i]
+        if i > 0:
+            prev_close = close[i - 1]
+            for candidate in (abs(high[i] - prev_close), abs(low[i] - prev_close)):
+                if candidate == candidate and (best != best or candidate > best):
+                    best = candidate
+        out[i] = best
+    
+    return out
+
+@njit('float64[::1](float64[::1], float64[::1], float64[::1], int64)', cache=True, nogil=True)
+def _atr(high, low, close, period):
+    return _rolling_sum(_true_range(high, low, close), period) / period
+
+@njit('float64[::1](float64[::1], float64[::1], float64[::1], float64[::1], int64)', cache=True, nogil=True, error_model='numpy')
+def _mfi(high, low, close, volume, period):
+    n = close.shape[0]
+    typical_price = (high + low + close) / 3
+    positive_flow = np.zeros(n)
+    negative_flow = np.zeros(n)
+    
+    for i in range(1, n):
+        money_flow = typical_price[i] * volume[i]
+        if typical_price[i] > typical_price[i - 1]:
+            positive_flow[i] = money_flow
+        elif typical_price[i] < typical_price[i - 1]:
+            negative_flow[i] = money_flow
+    
+    mfi_ratio = _rolling_sum(positive_flow, period) / _rolling_sum(negative_flow, period)
+    return 100 - (100 / (1 + mfi_ratio))
+
+@njit('float64[::1](float64[::1], int64)', cache=True, nogil=True, error_model='numpy')
+def _historical_volatility(close, period):
+    """对数收益率的滚动标准差年化，收益率与窗口 sum/sumsq 在同一遍循环中更新
+    
+    对数收益率量级很小且围绕0分布，sum/sumsq 相减不会出现大数值抵消，
+    用 log1p 计算可保留小涨跌幅的精度。
+    """
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if period < 2:
+        return out
+    
+    log_return = np.empty(n)
+    log_return[0] = np.nan
+    total = 0.0
+    total_sq = 0.0
+    nobs = 0
+    scale = np.sqrt(365) * 100
+    
+    for i in range(1, n):
+        value = np.log1p((close[i] - close[i - 1]) / close[i - 1])
+        log_return[i] = value
+        if value == value:
+            total += value
+            total_sq += value * value
+            nobs += 1
+        if i > period:
+            old = log_return[i - period]
+            if old == old:
+                total -= old
+                total_sq -= old * old
+                nobs -= 1
+        if nobs == period:
+            out[i] = np.sqrt(max(total_sq - total * total / period, 0.0) / (period - 1)) * scale
+    
+    return out
+
+@njit('float64[::1](float64[::1])', cache=True, nogil=True)
+def _nan_cumsum(values):
+    """与 pandas cumsum() 一致：NaN位置输出NaN，累计时跳过"""
+    n = values.shape[0]
+    out = np.empty(n)
+    total = 0.0
+    for i in range(n):
+        value = values[i]
+        if value == value:
+            total += value
+            out[i] = total
+        else:
+            out[i] = np.nan
+    return out
+
+@njit('float64[:, ::1](float64[::1], float64[::1], float64[::1], float64[::1], int64[::1], int64, int64, int64, int64, int64)', cache=True, nogil=True, error_model='numpy')
+def _all_indicators(high, low, close, volume, ma_periods, rsi_period,
+                    macd_fast, macd_slow, macd_signal, ratio_tail):
+    """一次调用算出 calculate_all_indicators 的全部指标
+    
+    共用收盘价/真实波幅/典型价格等中间结果，避免十几个函数各自在DataFrame上往返。
+    输出行的顺序与 _indicator_columns 一致。
+    BOLL_width/BOLL_position/ATR_percent/volume_ratio 只计算最后 ratio_tail 根K线，
+    更早的位置为NaN；ratio_tail >= n 时与逐列计算完全相同。
+    """
+    n = close.shape[0]
+    n_ma = ma_periods.shape[0]
+    out = np.empty((2 * n_ma + 22, n))
+    row = 0
+    ratio_start = max(n - ratio_tail, 0)
+    
+    for period in ma_periods:
+        out[row] = _rolling_sum(close, period) / period
+        row += 1
+    
+    # EMA各周期与MACD快慢线共用一次遍历
+    alphas = np.empty(n_ma + 2)
+    for i in range(n_ma):
+        alphas[i] = 2.0 / (ma_periods[i] + 1)
+    alphas[n_ma] = 2.0 / (macd_fast + 1)
+    alphas[n_ma + 1] = 2.0 / (macd_slow + 1)
+    emas = _ema_bank(close, alphas)
+    out[row:row + n_ma] = emas[:n_ma]
+    row += n_ma
+    
+    macd = emas[n_ma] - emas[n_ma + 1]
+    signal = _ewm_mean(macd, 2.0 / (macd_signal + 1))
+    out[row] = macd
+    out[row + 1] = signal
+    out[row + 2] = macd - signal
+    out[row + 3] = _rsi(close, rsi_period)
+    row += 4
+    
+    boll_middle, boll_upper, boll_lower = _bollinger(close, 20, 2)
+    out[row] = boll_middle
+    out[row + 1] = boll_upper
+    out[row + 2] = boll_lower
+    out[row + 3, :ratio_start] = np.nan
+    out[row + 4, :ratio_start] = np.nan
+    for i in range(ratio_start, n):
+        out[row + 3, i] = ((boll_upper[i] - boll_lower[i]) / boll_middle[i]) * 100
+        out[row + 4, i] = ((close[i] - boll_lower[i]) / (boll_upper[i] - boll_lower[i])) * 100
+    row += 5
+    
+    k, d, j = _kdj(high, low, close, 9)
+    out[row] = k
+    out[row + 1] = d
+    out[row + 2] = j
+    row += 3
+    
+    atr = _atr(high, low, close, 14)
+    out[row] = atr
+    out[row + 1, :ratio_start] = np.nan
+    for i in range(ratio_start, n):
+        out[row + 1, i] = (atr[i] / close[i]) * 100
+    row += 2
+    
+    obv = np.empty(n)
+    total = 0.0
+    for i in range(n):
+        if i > 0:
+            if close[i] > close[i - 1]:
+                total += volume[i]
+            elif close[i] < close[i - 1]:
+                total -= volume[i]
+        obv[i] = total
+    out[row] = obv
+    
+    typical_price = (high + low + close) / 3
+    out[row + 1] = _nan_cumsum(volume * typical_price) / _nan_cumsum(volume)
+    row += 2
+    
+    for period in (5, 10, 20):
+        out[row] = _rolling_sum(volume, period) / period
+        row += 1
+    out[row, :ratio_start] = np.nan
+    for i in range(ratio_start, n):
+        out[row, i] = volume[i] / out[row - 1, i]
+    row += 1
+    
+    out[row] = _mfi(high, low, close, volume, 14)
+    out[row + 1] = _historical_volatility(close, 20)
+    
+    return out
+
+def _indicator_columns(ma_periods: List[int]) -> List[str]:
+    return ([f'MA{p}' for p in ma_periods] + [f'EMA{p}' for p in ma_periods] + [
+        'MACD', 'MACD_signal', 'MACD_hist', 'RSI',
+        'BOLL_middle', 'BOLL_upper', 'BOLL_lower', 'BOLL_width', 'BOLL_position',
+        'K', 'D', 'J', 'ATR', 'ATR_percent', 'OBV', 'VWAP',
+        'VOL_MA5', 'VOL_MA10', 'VOL_MA20', 'volume_ratio', 'MFI', 'HV'
+    ])
+
+def _as_float_array(series: pd.Series) -> np.ndarray:
+    # 内核签名要求可写的C连续数组，写时复制模式下 to_numpy 可能返回只读视图，因此显式复制
+    return series.to_numpy(dtype=np.float64, copy=True)
+
+def _with_columns(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """一次性追加多列（同名旧列先删除），避免逐列插入导致DataFrame碎片化"""
+    if not isinstance(columns, pd.DataFrame):
+        columns = pd.DataFrame(columns, index=df.index)
+    existing = df.columns.intersection(columns.columns)
+    if len(existing):
+        df = df.drop(columns=existing)
+    return pd.concat([df, columns], axis=1)
+
 class IndicatorCalculator:
     @staticmethod
     def calculate_ma(df: pd.DataFrame, periods: List[int]) -> pd.DataFrame:
-        for period in periods:
-            df[f'MA{period}'] = df['close'].rolling(window=period).mean()
-        return df
+        close = _as_float_array(df['close'])
+        return _with_columns(df, {f'MA{period}': _rolling_sum(close, period) / period for period in periods})
     
     @staticmethod
     def calculate_ema(df: pd.DataFrame, periods: List[int]) -> pd.DataFrame:
-        for period in periods:
-            df[f'EMA{period}'] = df['close'].ewm(span=period, adjust=False).mean()
-        return df
+        alphas = np.array([2.0 / (period + 1) for period in periods])
+        emas = _ema_bank(_as_float_array(df['close']), alphas)
+        return _with_columns(df, {f'EMA{period}': ema for period, ema in zip(periods, emas)})
     
     @staticmethod
     def calculate_macd(df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9) -> pd.DataFrame:
-        exp1 = df['close'].ewm(span=fast, adjust=False).mean()
-        exp2 = df['close'].ewm(span=slow, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['MACD_signal'] = df['MACD'].ewm(span=signal, adjust=False).mean()
-        df['MACD_hist'] = df['MACD'] - df['MACD_signal']
+        fast_ema, slow_ema = _ema_bank(_as_float_array(df['close']), np.array([2.0 / (fast + 1), 2.0 / (slow + 1)]))
+        macd = fast_ema - slow_ema
+        macd_signal = _ewm_mean(macd, 2.0 / (signal + 1))
+        df['MACD'] = macd
+        df['MACD_signal'] = macd_signal
+        df['MACD_hist'] = macd - macd_signal
         return df
     
     @staticmethod
     def calculate_rsi(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        df['RSI'] = _rsi(_as_float_array(df['close']), period)
         return df
     
     @staticmethod
     def calculate_bollinger_bands(df: pd.DataFrame, period: int = 20, std: int = 2) -> pd.DataFrame:
-        df['BOLL_middle'] = df['close'].rolling(window=period).mean()
-        rolling_std = df['close'].rolling(window=period).std()
-        df['BOLL_upper'] = df['BOLL_middle'] + (rolling_std * std)
-        df['BOLL_lower'] = df['BOLL_middle'] - (rolling_std * std)
+        df['BOLL_middle'], df['BOLL_upper'], df['BOLL_lower'] = _bollinger(_as_float_array(df['close']), period, std)
         return df
     
     @staticmethod
     def calculate_kdj(df: pd.DataFrame, period: int = 9) -> pd.DataFrame:
-        low_min = df['low'].rolling(window=period).min()
-        high_max = df['high'].rolling(window=period).max()
-        
-        rsv = (df['close'] - low_min) / (high_max - low_min) * 100
-        df['K'] = rsv.ewm(com=2, adjust=False).mean()
-        df['D'] = df['K'].ewm(com=2, adjust=False).mean()
-        df['J'] = 3 * df['K'] - 2 * df['D']
+        df['K'], df['D'], df['J'] = _kdj(
+            _as_float_array(df['high']), _as_float_array(df['low']), _as_float_array(df['close']), period
+        )
         return df
     
     @staticmethod
     def calculate_atr(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
-        high_low = df['high'] - df['low']
-        high_close = abs(df['high'] - df['close'].shift())
-        low_close = abs(df['low'] - df['close'].shift())
-        
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        df['ATR'] = true_range.rolling(window=period).mean()
+        df['ATR'] = _atr(_as_float_array(df['high']), _as_float_array(df['low']), _as_float_array(df['close']), period)
         return df
     
     @staticmethod
     def calculate_obv(df: pd.DataFrame) -> pd.DataFrame:
-        obv = [0]
-        for i in range(1, len(df)):
-            if df['close'].iloc[i] > df['close'].iloc[i-1]:
-                obv.append(obv[-1] + df['volume'].iloc[i])
-            elif df['close'].iloc[i] < df['close'].iloc[i-1]:
-                obv.append(obv[-1] - df['volume'].iloc[i])
-            else:
-                obv.append(obv[-1])
-        df['OBV'] = obv
+        close = _as_float_array(df['close'])
+        volume = _as_float_array(df['volume'])
+        # 与逐根比较一致：首根及收盘价持平（含NaN）时方向为0
+        delta = np.diff(close, prepend=close[:1])
+        direction = (delta > 0).astype(np.float64) - (delta < 0)
+        df['OBV'] = np.cumsum(direction * volume)
         return df
     
     @staticmethod
@@ -152,93 +623,104 @@ class IndicatorCalculator:
     @staticmethod
     def calculate_volume_ma(df: pd.DataFrame, periods: List[int] = [5, 10, 20]) -> pd.DataFrame:
         """成交量均线 - 判断放量缩量"""
-        for period in periods:
-            df[f'VOL_MA{period}'] = df['volume'].rolling(window=period).mean()
-        
-        df['volume_ratio'] = df['volume'] / df['VOL_MA20']
-        return df
+        volume = _as_float_array(df['volume'])
+        columns = {f'VOL_MA{period}': _rolling_sum(volume, period) / period for period in periods}
+        columns['volume_ratio'] = volume / columns['VOL_MA20']
+        return _with_columns(df, columns)
     
     @staticmethod
     def calculate_mfi(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
         """资金流量指数 - 结合价格和成交量的RSI"""
-        typical_price = (df['high'] + df['low'] + df['close']) / 3
-        money_flow = typical_price * df['volume']
-        
-        positive_flow = []
-        negative_flow = []
-        
-        for i in range(1, len(df)):
-            if typical_price.iloc[i] > typical_price.iloc[i-1]:
-                positive_flow.append(money_flow.iloc[i])
-                negative_flow.append(0)
-            elif typical_price.iloc[i] < typical_price.iloc[i-1]:
-                positive_flow.append(0)
-                negative_flow.append(money_flow.iloc[i])
-            else:
-                positive_flow.append(0)
-                negative_flow.append(0)
-        
-        positive_flow = pd.Series([0] + positive_flow, index=df.index)
-        negative_flow = pd.Series([0] + negative_flow, index=df.index)
-        
-        positive_mf = positive_flow.rolling(window=period).sum()
-        negative_mf = negative_flow.rolling(window=period).sum()
-        
-        mfi_ratio = positive_mf / negative_mf
-        df['MFI'] = 100 - (100 / (1 + mfi_ratio))
+        df['MFI'] = _mfi(
+            _as_float_array(df['high']), _as_float_array(df['low']),
+            _as_float_array(df['close']), _as_float_array(df['volume']), period
+        )
         return df
     
     @staticmethod
     def calculate_atr_percent(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
         """ATR百分比 - 相对波动率"""
-        high_low = df['high'] - df['low']
-        high_close = abs(df['high'] - df['close'].shift())
-        low_close = abs(df['low'] - df['close'].shift())
-        
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        df['ATR'] = true_range.rolling(window=period).mean()
-        df['ATR_percent'] = (df['ATR'] / df['close']) * 100
+        close = _as_float_array(df['close'])
+        atr = _atr(_as_float_array(df['high']), _as_float_array(df['low']), close, period)
+        df['ATR'] = atr
+        df['ATR_percent'] = (atr / close) * 100
         return df
     
     @staticmethod
     def calculate_bollinger_bandwidth(df: pd.DataFrame, period: int = 20, std: int = 2) -> pd.DataFrame:
         """布林带宽度 - 判断行情收敛/发散"""
-        df['BOLL_middle'] = df['close'].rolling(window=period).mean()
-        rolling_std = df['close'].rolling(window=period).std()
-        df['BOLL_upper'] = df['BOLL_middle'] + (rolling_std * std)
-        df['BOLL_lower'] = df['BOLL_middle'] - (rolling_std * std)
-        
-        df['BOLL_width'] = ((df['BOLL_upper'] - df['BOLL_lower']) / df['BOLL_middle']) * 100
-        df['BOLL_position'] = ((df['close'] - df['BOLL_lower']) / (df['BOLL_upper'] - df['BOLL_lower'])) * 100
+        close = _as_float_array(df['close'])
+        middle, upper, lower = _bollinger(close, period, std)
+        df['BOLL_middle'], df['BOLL_upper'], df['BOLL_lower'] = middle, upper, lower
+        df['BOLL_width'], df['BOLL_position'] = _bollinger_bandwidth(close, middle, upper, lower)
         return df
     
     @staticmethod
     def calculate_historical_volatility(df: pd.DataFrame, period: int = 20) -> pd.DataFrame:
         """历史波动率 - 年化波动率"""
-        log_return = np.log(df['close'] / df['close'].shift(1))
-        df['HV'] = log_return.rolling(window=period).std() * np.sqrt(365) * 100
+        df['HV'] = _historical_volatility(_as_float_array(df['close']), period)
         return df
     
     @staticmethod
     def calculate_all_indicators(df: pd.DataFrame, ma_periods: List[int] = [5, 10, 20, 60],
-                                 rsi_period: int = 14, macd_params: List[int] = [12, 26, 9]) -> pd.DataFrame:
-        df = IndicatorCalculator.calculate_ma(df, ma_periods)
-        df = IndicatorCalculator.calculate_ema(df, ma_periods)
-        df = IndicatorCalculator.calculate_macd(df, *macd_params)
-        df = IndicatorCalculator.calculate_rsi(df, rsi_period)
-        df = IndicatorCalculator.calculate_bollinger_bandwidth(df)
-        df = IndicatorCalculator.calculate_kdj(df)
-        df = IndicatorCalculator.calculate_atr_percent(df)
-        df = IndicatorCalculator.calculate_obv(df)
-        df = IndicatorCalculator.calculate_vwap(df)
-        df = IndicatorCalculator.calculate_volume_ma(df, [5, 10, 20])
-        df = IndicatorCalculator.calculate_mfi(df)
-        df = IndicatorCalculator.calculate_historical_volatility(df)
-        return df
+                                 rsi_period: int = 14, macd_params: List[int] = [12, 26, 9],
+                                 ratio_tail: Optional[int] = None) -> pd.DataFrame:
+        """计算全部指标，结果与依次调用各 calculate_* 相同
+        
+        ratio_tail: 只需要最后几根K线时传入，BOLL_width/BOLL_position/ATR_percent/volume_ratio
+                    仅计算这几根，其余为NaN；默认计算整列
+        """
+        values = _all_indicators(
+            _as_float_array(df['high']), _as_float_array(df['low']),
+            _as_float_array(df['close']), _as_float_array(df['volume']),
+            np.asarray(ma_periods, dtype=np.int64), int(rsi_period), *(int(p) for p in macd_params),
+            len(df) if ratio_tail is None else int(ratio_tail)
+        )
+        return _with_columns(df, pd.DataFrame(values.T, columns=_indicator_columns(ma_periods), index=df.index))
 
 class MarketDataCollector:
+    _HEADER_TEMPLATE = (
+        "=== 市场数据 ===\n"
+        "交易对: {symbol}\n"
+        "当前价格: ${price:.2f}\n"
+        "时间: {timestamp}\n"
+        "\n"
+    )
+    
+    _ACCOUNT_TEMPLATE = (
+        "\n"
+        "=== 账户信息 ===\n"
+        "总资金: ${total_balance:.2f}\n"
+        "可用资金: ${available:.2f}\n"
+        "已用保证金: ${margin_used:.2f}\n"
+        "未实现盈亏: ${unrealized_pnl:.2f}\n"
+        "账户权益: ${equity:.2f}\n"
+        "\n"
+    )
+    
+    _POSITION_TEMPLATE = (
+        "[{position_id}] {direction} ${amount:.2f} @ {leverage}x\n"
+        "  入场: ${entry_price:.2f} | 当前: ${current_price:.2f}\n"
+        "  盈亏: ${unrealized_pnl:.2f} ({pnl_percent:.2f}%)\n"
+        "  止损: ${stop_loss:.2f} | 止盈: ${take_profit:.2f}\n"
+        "  持仓时长: {hold_minutes}分钟\n\n"
+    )
+    
+    _PLAN_TEMPLATE = (
+        "[{plan_id}] 触发价${trigger_price:.2f} {direction} ${amount:.2f} @ {leverage}x\n"
+        "  止损: ${stop_loss:.2f} | 止盈: ${take_profit:.2f}\n\n"
+    )
+    
+    _ALERT_TEMPLATE = (
+        "[{alert_id}] {condition} ${price:.2f}\n"
+        "  说明: {description}\n"
+        "  创建时间: {create_time}\n\n"
+    )
+    
     def __init__(self, config):
         self.config = config
+        self.max_prompt_positions = config.get('agent.max_prompt_positions', 20)
+        self.max_prompt_plans = config.get('agent.max_prompt_plans', 20)
         self.collector = DataCollector(
             exchange_id='gate',
             api_key=config.gateio_key,
@@ -246,6 +728,10 @@ class MarketDataCollector:
             cache_ttl=config.get('cache.history_ttl', 86400)
         )
         self.calculator = IndicatorCalculator()
+        # 各周期K线请求互不依赖，并发发出，总耗时取决于最慢的一次而不是逐个相加
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, len(config.timeframes)), thread_name_prefix='ohlcv'
+        )
     
     def collect_market_data(self, symbol: str) -> Dict:
         market_data = {
@@ -255,79 +741,94 @@ class MarketDataCollector:
             "timeframes": {}
         }
         
-        for timeframe in self.config.timeframes:
-            df = self.collector.get_ohlcv(symbol, timeframe, limit=200)
-            
-            if df is None or df.empty:
+        timeframes = self.config.timeframes
+        # 指标参数对每个周期都相同，只解析一次
+        indicator_params = {
+            "ma_periods": self.config.get('indicators.ma_periods', [5, 10, 20, 60]),
+            "rsi_period": self.config.get('indicators.rsi_period', 14),
+            "macd_params": self.config.get('indicators.macd_params', [12, 26, 9])
+        }
+        futures = [
+            self.executor.submit(self._collect_timeframe, symbol, timeframe, indicator_params)
+            for timeframe in timeframes
+        ]
+        
+        for timeframe, future in zip(timeframes, futures):
+            timeframe_data = future.result()
+            if timeframe_data is None:
                 continue
             
-            df = self.calculator.calculate_all_indicators(
-                df,
-                ma_periods=self.config.get('indicators.ma_periods', [5, 10, 20, 60]),
-                rsi_period=self.config.get('indicators.rsi_period', 14),
-                macd_params=self.config.get('indicators.macd_params', [12, 26, 9])
-            )
-            
-            latest = df.iloc[-1].to_dict()
-            latest['timestamp'] = latest['timestamp'].isoformat() if isinstance(latest['timestamp'], datetime) else latest['timestamp']
-            
-            prev = df.iloc[-2].to_dict() if len(df) > 1 else {}
-            if prev and 'timestamp' in prev:
-                prev['timestamp'] = prev['timestamp'].isoformat() if isinstance(prev['timestamp'], datetime) else prev['timestamp']
-            
-            market_data['timeframes'][timeframe] = {
-                "latest": latest,
-                "previous": prev,
-                "candles_count": len(df)
-            }
+            market_data['timeframes'][timeframe] = timeframe_data
             
             if timeframe == '1m' and market_data['current_price'] is None:
-                market_data['current_price'] = latest.get('close')
+                market_data['current_price'] = timeframe_data['latest'].get('close')
         
         if market_data['current_price'] is None:
             return {"error": "无法获取当前价格"}
         
         return market_data
     
+    def _collect_timeframe(self, symbol: str, timeframe: str, indicator_params: Dict) -> Optional[Dict]:
+        """获取单个周期的K线并计算指标，在线程池中执行"""
+        df = self.collector.get_ohlcv(symbol, timeframe, limit=200)
+        
+        if df is None or df.empty:
+            return None
+        
+        # 只读取最后两根K线（latest/previous），比值类指标无需整列计算
+        df = self.calculator.calculate_all_indicators(df, ratio_tail=2, **indicator_params)
+        
+        latest = df.iloc[-1].to_dict()
+        latest['timestamp'] = latest['timestamp'].isoformat() if isinstance(latest['timestamp'], datetime) else latest['timestamp']
+        
+        prev = df.iloc[-2].to_dict() if len(df) > 1 else {}
+        if prev and 'timestamp' in prev:
+            prev['timestamp'] = prev['timestamp'].isoformat() if isinstance(prev['timestamp'], datetime) else prev['timestamp']
+        
+        return {
+            "latest": latest,
+            "previous": prev,
+            "candles_count": len(df)
+        }
+    
     def format_data_for_agent(self, market_data: Dict, account_info: Dict, 
                              positions: List[Dict], plans: List[Dict],
                              alerts: List[Dict] = None) -> str:
-        formatted = f"""=== 市场数据 ===
-交易对: {market_data.get('symbol', 'N/A')}
-当前价格: ${market_data.get('current_price', 0):.2f}
-时间: {market_data.get('timestamp', 'N/A')}
-
-"""
+        parts = [self._HEADER_TEMPLATE.format(
+            symbol=market_data.get('symbol', 'N/A'),
+            price=market_data.get('current_price', 0),
+            timestamp=market_data.get('timestamp', 'N/A')
+        )]
         
         for timeframe, data in market_data.get('timeframes', {}).items():
             latest = data.get('latest', {})
-            formatted += f"\n【{timeframe}周期】\n"
-            formatted += f"  价格: ${latest.get('close', 0):.2f} (高${latest.get('high', 0):.2f}/低${latest.get('low', 0):.2f})\n"
+            parts.append(f"\n【{timeframe}周期】\n")
+            parts.append(f"  价格: ${latest.get('close', 0):.2f} (高${latest.get('high', 0):.2f}/低${latest.get('low', 0):.2f})\n")
             
             if 'MA5' in latest:
-                formatted += f"  MA(5/10/20/60): {latest.get('MA5', 0):.2f}/{latest.get('MA10', 0):.2f}/"
-                formatted += f"{latest.get('MA20', 0):.2f}/{latest.get('MA60', 0):.2f}\n"
+                parts.append(f"  MA(5/10/20/60): {latest.get('MA5', 0):.2f}/{latest.get('MA10', 0):.2f}/"
+                             f"{latest.get('MA20', 0):.2f}/{latest.get('MA60', 0):.2f}\n")
             
             if 'RSI' in latest:
-                formatted += f"  RSI: {latest.get('RSI', 0):.2f}"
+                parts.append(f"  RSI: {latest.get('RSI', 0):.2f}")
                 if 'MFI' in latest:
-                    formatted += f" | MFI(资金流): {latest.get('MFI', 0):.2f}"
-                formatted += "\n"
+                    parts.append(f" | MFI(资金流): {latest.get('MFI', 0):.2f}")
+                parts.append("\n")
             
             if 'MACD' in latest:
-                formatted += f"  MACD: {latest.get('MACD', 0):.4f} | "
-                formatted += f"信号: {latest.get('MACD_signal', 0):.4f} | "
-                formatted += f"柱状: {latest.get('MACD_hist', 0):.4f}\n"
+                parts.append(f"  MACD: {latest.get('MACD', 0):.4f} | "
+                             f"信号: {latest.get('MACD_signal', 0):.4f} | "
+                             f"柱状: {latest.get('MACD_hist', 0):.4f}\n")
             
             if 'BOLL_upper' in latest:
-                formatted += f"  BOLL: 上轨{latest.get('BOLL_upper', 0):.2f} | "
-                formatted += f"中轨{latest.get('BOLL_middle', 0):.2f} | "
-                formatted += f"下轨{latest.get('BOLL_lower', 0):.2f}"
+                parts.append(f"  BOLL: 上轨{latest.get('BOLL_upper', 0):.2f} | "
+                             f"中轨{latest.get('BOLL_middle', 0):.2f} | "
+                             f"下轨{latest.get('BOLL_lower', 0):.2f}")
                 if 'BOLL_width' in latest:
-                    formatted += f" | 带宽{latest.get('BOLL_width', 0):.2f}%"
+                    parts.append(f" | 带宽{latest.get('BOLL_width', 0):.2f}%")
                 if 'BOLL_position' in latest:
-                    formatted += f" | 位置{latest.get('BOLL_position', 0):.1f}%"
-                formatted += "\n"
+                    parts.append(f" | 位置{latest.get('BOLL_position', 0):.1f}%")
+                parts.append("\n")
             
             volume_info = []
             if 'volume' in latest and 'VOL_MA20' in latest:
@@ -339,7 +840,7 @@ class MarketDataCollector:
                 volume_info.append(f"VWAP: ${latest.get('VWAP', 0):.2f} (偏离{vwap_diff:+.2f}%)")
             
             if volume_info:
-                formatted += f"  {' | '.join(volume_info)}\n"
+                parts.append(f"  {' | '.join(volume_info)}\n")
             
             volatility_info = []
             if 'ATR_percent' in latest:
@@ -349,46 +850,59 @@ class MarketDataCollector:
                 volatility_info.append(f"历史波动率: {latest.get('HV', 0):.1f}%")
             
             if volatility_info:
-                formatted += f"  波动率: {' | '.join(volatility_info)}\n"
+                parts.append(f"  波动率: {' | '.join(volatility_info)}\n")
         
-        formatted += f"""
-=== 账户信息 ===
-总资金: ${account_info.get('total_balance', 0):.2f}
-可用资金: ${account_info.get('available', 0):.2f}
-已用保证金: ${account_info.get('margin_used', 0):.2f}
-未实现盈亏: ${account_info.get('unrealized_pnl', 0):.2f}
-账户权益: ${account_info.get('equity', 0):.2f}
-
-"""
+        parts.append(self._ACCOUNT_TEMPLATE.format(
+            total_balance=account_info.get('total_balance', 0),
+            available=account_info.get('available', 0),
+            margin_used=account_info.get('margin_used', 0),
+            unrealized_pnl=account_info.get('unrealized_pnl', 0),
+            equity=account_info.get('equity', 0)
+        ))
         
+        parts.append("=== 当前持仓 ===\n")
         if positions:
-            formatted += "=== 当前持仓 ===\n"
-            for pos in positions:
-                formatted += f"[{pos['position_id']}] {pos['direction'].upper()} "
-                formatted += f"${pos['amount']:.2f} @ {pos['leverage']}x\n"
-                formatted += f"  入场: ${pos['entry_price']:.2f} | 当前: ${pos['current_price']:.2f}\n"
-                formatted += f"  盈亏: ${pos['unrealized_pnl']:.2f} ({pos['pnl_percent']:.2f}%)\n"
-                formatted += f"  止损: ${pos['stop_loss']:.2f} | 止盈: ${pos['take_profit']:.2f}\n"
-                formatted += f"  持仓时长: {int(pos['hold_time_seconds']//60)}分钟\n\n"
+            shown = self._top_by_amount(positions, self.max_prompt_positions)
+            for pos in shown:
+                parts.append(self._POSITION_TEMPLATE.format_map({
+                    **pos,
+                    "direction": pos['direction'].upper(),
+                    "hold_minutes": int(pos['hold_time_seconds'] // 60)
+                }))
+            if len(shown) < len(positions):
+                parts.append(f"(另有 {len(positions) - len(shown)} 个较小仓位未列出)\n\n")
         else:
-            formatted += "=== 当前持仓 ===\n无持仓\n\n"
+            parts.append("无持仓\n\n")
         
+        parts.append("=== 待触发计划 ===\n")
         if plans:
-            formatted += "=== 待触发计划 ===\n"
-            for plan in plans:
-                formatted += f"[{plan['plan_id']}] 触发价${plan['trigger_price']:.2f} "
-                formatted += f"{plan['direction'].upper()} ${plan['amount']:.2f} @ {plan['leverage']}x\n"
-                formatted += f"  止损: ${plan['stop_loss']:.2f} | 止盈: ${plan['take_profit']:.2f}\n\n"
+            shown = self._top_by_amount(plans, self.max_prompt_plans)
+            for plan in shown:
+                parts.append(self._PLAN_TEMPLATE.format_map({
+                    **plan,
+                    "direction": plan['direction'].upper()
+                }))
+            if len(shown) < len(plans):
+                parts.append(f"(另有 {len(plans) - len(shown)} 个较小计划未列出)\n\n")
         else:
-            formatted += "=== 待触发计划 ===\n无计划\n\n"
+            parts.append("无计划\n\n")
         
+        parts.append("=== 价格预警 ===\n")
         if alerts:
-            formatted += "=== 价格预警 ===\n"
             for alert in alerts:
-                formatted += f"[{alert['alert_id']}] {alert['condition'].upper()} ${alert['price']:.2f}\n"
-                formatted += f"  说明: {alert.get('description', '无')}\n"
-                formatted += f"  创建时间: {alert['create_time']}\n\n"
+                parts.append(self._ALERT_TEMPLATE.format_map({
+                    **alert,
+                    "condition": alert['condition'].upper(),
+                    "description": alert.get('description', '无')
+                }))
         else:
-            formatted += "=== 价格预警 ===\n无预警\n\n"
+            parts.append("无预警\n\n")
         
-        return formatted
\ No newline at end of file
+        return "".join(parts)
+    
+    @staticmethod
+    def _top_by_amount(items: List[Dict], limit: int) -> List[Dict]:
+        """按名义金额保留最大的 limit 项，控制提示词长度"""
+        if len(items) <= limit:
+            return items
+        return sorted(items, key=lambda item: item['amount'], reverse=True)[:limit]
@@ -1,7 +1,8 @@
-from typing import Dict, List, Callable, Optional
+from typing import Dict, List, Callable, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import asyncio
+import numpy as np
 
 @dataclass
 class PriceAlert:
@@ -18,7 +19,41 @@ class PriceAlertManager:
     
     def __init__(self):
         self.alerts: Dict[str, PriceAlert] = {}
+        # (价格分, 方向) -> alert_id，去重时O(1)查找
+        self._index: Dict[Tuple[int, str], str] = {}
         self.last_price: Optional[float] = None
+        
+        # check_alerts 使用的数组视图，预警增删后在下一次检查时重建
+        self._ids: List[str] = []
+        self._prices = np.empty(0)
+        self._above = np.empty(0, dtype=bool)
+        self._below = np.empty(0, dtype=bool)
+        self._arrays_dirty = False
+    
+    @staticmethod
+    def _index_key(price: float, condition: str) -> Tuple[int, str]:
+        return (round(price * 100), condition)
+    
+    def _add(self, alert: PriceAlert):
+        self.alerts[alert.id] = alert
+        self._index[self._index_key(alert.price, alert.condition)] = alert.id
+        self._arrays_dirty = True
+    
+    def _remove(self, alert_id: str):
+        alert = self.alerts.pop(alert_id)
+        key = self._index_key(alert.price, alert.condition)
+        if self._index.get(key) == alert_id:
+            del self._index[key]
+        self._arrays_dirty = True
+    
+    def _rebuild_arrays(self):
+        # 先清标记再取快照：重建期间并发的增删会在下一次检查时再次重建
+        self._arrays_dirty = False
+        active = [alert for alert in list(self.alerts.values()) if not alert.triggered]
+        self._ids = [alert.id for alert in active]
+        self._prices = np.array([alert.price for alert in active], dtype=np.float64)
+        self._above = np.array([alert.condition == 'above' for alert in active], dtype=bool)
+        self._below = np.array([alert.condition == 'below' for alert in active], dtype=bool)
     
     def create_alert(self, price: float, condition: str, callback: Callable, 
                     description: str = "") -> str:
@@ -34,11 +69,10 @@ class PriceAlertManager:
         Returns:
             alert_id
         """
-        # 检查是否已存在相同的预警
-        for alert in self.alerts.values():
-            if abs(alert.price - price) < 0.01 and alert.condition == condition:
-                # 相同价格和方向的预警已存在，不重复创建
-                return alert.id
+        # 相同价格（精确到分）和方向的预警已存在，不重复创建
+        existing_id = self._index.get(self._index_key(price, condition))
+        if existing_id is not None:
+            return existing_id
         
         import uuid
         alert_id = f"alert_{uuid.uuid4().hex[:8]}"
@@ -52,13 +86,13 @@ class PriceAlertManager:
             description=description
         )
         
-        self.alerts[alert_id] = alert
+        self._add(alert)
         return alert_id
     
     def cancel_alert(self, alert_id: str) -> bool:
         """取消预警"""
         if alert_id in self.alerts:
-            del self.alerts[alert_id]
+            self._remove(alert_id)
             return True
         return False
     
@@ -70,22 +104,22 @@ class PriceAlertManager:
         
         triggered_alerts = []
         
-        for alert_id, alert in list(self.alerts.items()):
-            if alert.triggered:
-                continue
-            
-            triggered = False
-            
-            if alert.condition == 'above':
-                # 向上突破
-                if self.last_price < alert.price <= current_price:
-                    triggered = True
-            elif alert.condition == 'below':
-                # 向下突破
-                if self.last_price > alert.price >= current_price:
-                    triggered = True
+        if self._arrays_dirty:
+            self._rebuild_arrays()
+        
+        if self._ids:
+            prices = self._prices
+            # 向上突破 / 向下突破，一次向量化比较所有预警
+            fired = (
+                (self._above & (self.last_price < prices) & (prices <= current_price))
+                | (self._below & (self.last_price > prices) & (prices >= current_price))
+            )
             
-            if triggered:
+            for index in np.flatnonzero(fired):
+                alert = self.alerts.get(self._ids[index])
+                if alert is None or alert.triggered:
+                    continue
+                
                 alert.triggered = True
                 triggered_alerts.append(alert)
                 
@@ -95,7 +129,7 @@ class PriceAlertManager:
                     print(f"价格预警回调错误: {e}")
                 
                 # 预警是一次性的，触发后删除
-                del self.alerts[alert_id]
+                self._remove(alert.id)
         
         self.last_price = current_price
         return triggered_alerts
@@ -146,4 +180,4 @@ class PriceAlertManager:
                     triggered=alert_data.get('triggered', False),
                     description=alert_data.get('description', '')
                 )
-                self.alerts[alert.id] = alert
\ No newline at end of file
+                self._add(alert)
\ No newline at end of file
@@ -1,5 +1,5 @@
 import asyncio
-import json
+import orjson
 from typing import Callable, Optional
 import websockets
 from datetime import datetime
@@ -7,14 +7,17 @@ from datetime import datetime
 class PriceStreamManager:
     """实时价格推送管理器 - 使用WebSocket"""
     
-    def __init__(self, symbol: str, callback: Callable[[float], None]):
+    def __init__(self, symbol: str, callback: Callable[[float], None], run_in_thread: bool = False):
         """
         Args:
             symbol: 交易对，如 BTC_USDT
             callback: 价格更新回调函数
+            run_in_thread: 回调可能阻塞时设为True，放到线程池执行；
+                默认直接在事件循环中调用，省去每个tick的线程调度开销
         """
         self.symbol = symbol
         self.callback = callback
+        self.run_in_thread = run_in_thread
         self.running = False
         self.websocket = None
         
@@ -39,7 +42,7 @@ class PriceStreamManager:
                         "payload": [self.symbol]
                     }
                     
-                    await ws.send(json.dumps(subscribe_msg))
+                    await ws.send(orjson.dumps(subscribe_msg).decode())
                     print(f"已订阅 {self.symbol} 实时价格推送")
                     
                     async for message in ws:
@@ -47,7 +50,7 @@ class PriceStreamManager:
                             break
                         
                         try:
-                            data = json.loads(message)
+                            data = orjson.loads(message)
                             
                             if data.get('event') == 'update' and data.get('channel') == 'futures.tickers':
                                 result = data.get('result')
@@ -59,9 +62,12 @@ class PriceStreamManager:
                                             self.last_price = price
                                             self.last_update_time = datetime.now()
                                             
-                                            await asyncio.to_thread(self.callback, price)
+                                            if self.run_in_thread:
+                                                await asyncio.to_thread(self.callback, price)
+                                            else:
+                                                self.callback(price)
                         
-                        except json.JSONDecodeError:
+                        except orjson.JSONDecodeError:
                             continue
                         except Exception as e:
                             print(f"处理WebSocket消息错误: {e}")
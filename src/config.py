@@ -1,11 +1,16 @@
 import json
 import os
+from functools import cached_property
 from typing import Dict, Any
 
+_MISSING = object()
+
 class Config:
     def __init__(self, config_path: str = "config/config.json"):
         self.config_path = config_path
         self.config = self.load_config()
+        # 配置加载后不再变化，缓存点分路径的解析结果
+        self._get_cache: Dict[str, Any] = {}
     
     def load_config(self) -> Dict[str, Any]:
         if not os.path.exists(self.config_path):
@@ -15,15 +20,25 @@ class Config:
             return json.load(f)
     
     def get(self, key: str, default=None):
-        keys = key.split('.')
+        value = self._get_cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._resolve(key)
+            self._get_cache[key] = value
+        return default if value is _MISSING else value
+    
+    def _resolve(self, key: str):
         value = self.config
-        for k in keys:
-            if isinstance(value, dict):
-                value = value.get(k, default)
-            else:
-                return default
+        for k in key.split('.'):
+            if not isinstance(value, dict) or k not in value:
+                return _MISSING
+            value = value[k]
         return value
     
+    def invalidate_cache(self):
+        """配置或prompt文件被修改后调用，下次访问时重新解析"""
+        self._get_cache.clear()
+        self.__dict__.pop('system_prompt', None)
+    
     def load_system_prompt(self) -> str:
         """加载system prompt，支持从文件或配置中读取，并替换动态配置项"""
         prompt_file = "prompts/system_prompt.md"
@@ -92,6 +107,22 @@ class Config:
         return int(self.get('loop.plan_check_interval', 1))
     
     @property
+    def state_flush_interval(self) -> float:
+        return float(self.get('loop.state_flush_interval', 5))
+    
+    @property
+    def prefetch_max_age(self) -> float:
+        return float(self.get('loop.prefetch_max_age', 30))
+    
+    @property
+    def keep_raw_response(self) -> bool:
+        return bool(self.get('agent.keep_raw_response', False))
+    
+    @property
+    def max_history_tokens(self) -> int:
+        return int(self.get('agent.max_history_tokens', 16000))
+    
+    @cached_property
     def system_prompt(self) -> str:
         return self.load_system_prompt()
 
@@ -1,3 +1,7 @@
-from .simulated_executor import SimulatedExecutor, Direction, Position, TradingPlan, Account
+from .simulated_executor import (
+    SimulatedExecutor, ExecutorSnapshot, Direction, Position, PositionStatus, TradingPlan, PlanStatus, Account,
+    ns_to_datetime, datetime_to_ns
+)
 
-__all__ = ['SimulatedExecutor', 'Direction', 'Position', 'TradingPlan', 'Account']
+__all__ = ['SimulatedExecutor', 'ExecutorSnapshot', 'Direction', 'Position', 'PositionStatus',
+           'TradingPlan', 'PlanStatus', 'Account', 'ns_to_datetime', 'datetime_to_ns']
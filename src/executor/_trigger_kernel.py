@@ -0,0 +1,28 @@
+"""每个tick的止损止盈扫描内核
+
+输入为 SimulatedExecutor 维护的并行数组，方向以 +1(做多)/-1(做空) 表示，
+乘以方向后做空与做多使用同一组比较。未安装 numba 时按纯 Python 循环执行，结果一致。
+"""
+
+from ..collector._njit import njit
+
+HIT_NONE = 0
+HIT_STOP_LOSS = 1
+HIT_TAKE_PROFIT = 2
+
+@njit('int64(float64, float64[::1], float64[::1], float64[::1], int8[::1])', cache=True, nogil=True)
+def scan_sltp(price, sl, tp, dir_sign, out_hits):
+    """逐仓位写入 0/1/2（未触发/止损/止盈），返回触发数量；同时满足时止损优先"""
+    count = 0
+    for i in range(sl.shape[0]):
+        if (price - sl[i]) * dir_sign[i] <= 0:
+            out_hits[i] = HIT_STOP_LOSS
+            count += 1
+        elif (tp[i] - price) * dir_sign[i] <= 0:
+            out_hits[i] = HIT_TAKE_PROFIT
+            count += 1
+        else:
+            out_hits[i] = HIT_NONE
+    return count
+
+__all__ = ['scan_sltp', 'HIT_NONE', 'HIT_STOP_LOSS', 'HIT_TAKE_PROFIT']
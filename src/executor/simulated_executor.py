@@ -1,9 +1,23 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, List, Dict, Callable
+from typing import Optional, List, Dict, Callable, Iterable
 from enum import Enum
-import uuid
+from collections import deque
+from itertools import islice
+import copy
+import heapq
+import os
 import time
+import numpy as np
+from ._trigger_kernel import scan_sltp, HIT_STOP_LOSS
+
+def ns_to_datetime(ns: int) -> datetime:
+    """time.time_ns() 时间戳转为本地时间 datetime（微秒精度）"""
+    seconds, remainder = divmod(ns, 1_000_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=remainder // 1000)
+
+def datetime_to_ns(value: datetime) -> int:
+    return int(value.replace(microsecond=0).timestamp()) * 1_000_000_000 + value.microsecond * 1000
 
 class Direction(Enum):
     LONG = "long"
@@ -18,7 +32,7 @@ class PlanStatus(Enum):
     TRIGGERED = "triggered"
     CANCELLED = "cancelled"
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     id: str
     symbol: str
@@ -28,39 +42,35 @@ class Position:
     leverage: int
     stop_loss: float
     take_profit: float
-    open_time: datetime
+    open_time: int  # time.time_ns()
     status: PositionStatus = PositionStatus.OPEN
-    close_time: Optional[datetime] = None
+    close_time: Optional[int] = None
     close_price: Optional[float] = None
     realized_pnl: float = 0.0
+    # 做多 +1.0 / 做空 -1.0，盈亏和止损止盈判断乘以方向后不再分支
+    dir_sign: float = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        self.dir_sign = 1.0 if self.direction is Direction.LONG else -1.0
     
     @property
     def margin_used(self) -> float:
         return self.amount / self.leverage
     
     def unrealized_pnl(self, current_price: float) -> float:
-        if self.status == PositionStatus.CLOSED:
+        if self.status is PositionStatus.CLOSED:
             return 0.0
-        
-        if self.direction == Direction.LONG:
-            return (current_price - self.entry_price) * self.amount / self.entry_price
-        else:
-            return (self.entry_price - current_price) * self.amount / self.entry_price
+        # 做空且价格未变时乘积为 -0.0，加 0.0 归一，避免显示成 -0.00
+        return self.dir_sign * (current_price - self.entry_price) * self.amount / self.entry_price + 0.0
     
     def check_stop_loss_take_profit(self, current_price: float) -> Optional[str]:
-        if self.direction == Direction.LONG:
-            if current_price <= self.stop_loss:
-                return "stop_loss"
-            elif current_price >= self.take_profit:
-                return "take_profit"
-        else:
-            if current_price >= self.stop_loss:
-                return "stop_loss"
-            elif current_price <= self.take_profit:
-                return "take_profit"
+        if (current_price - self.stop_loss) * self.dir_sign <= 0:
+            return "stop_loss"
+        if (self.take_profit - current_price) * self.dir_sign <= 0:
+            return "take_profit"
         return None
 
-@dataclass
+@dataclass(slots=True)
 class TradingPlan:
     id: str
     symbol: str
@@ -70,14 +80,19 @@ class TradingPlan:
     leverage: int
     stop_loss: float
     take_profit: float
-    create_time: datetime
+    create_time: int  # time.time_ns()
     status: PlanStatus = PlanStatus.PENDING
+    # 方向只有两种，热路径用布尔值判断，direction 保留用于序列化
+    is_long: bool = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        self.is_long = self.direction is Direction.LONG
     
     def check_trigger(self, current_price: float, last_price: float) -> bool:
-        if self.status != PlanStatus.PENDING:
+        if self.status is not PlanStatus.PENDING:
             return False
         
-        if self.direction == Direction.LONG:
+        if self.is_long:
             return last_price < self.trigger_price <= current_price
         else:
             return last_price > self.trigger_price >= current_price
@@ -93,7 +108,28 @@ class Account:
     def equity(self) -> float:
         return self.total_balance + self.unrealized_pnl
 
+@dataclass(frozen=True, slots=True)
+class ExecutorSnapshot:
+    """某一时刻的执行器状态副本，只读
+    
+    由交易路径在状态变化后整体替换发布，其他线程（如后台保存）读取时无需加锁，
+    也不会读到修改到一半的持仓/计划。
+    """
+    version: int
+    total_balance: float
+    positions: Dict[str, Position]
+    plans: Dict[str, TradingPlan]
+    recent_trades: tuple
+    closed_positions: tuple
+
 class SimulatedExecutor:
+    # 快照中保留的最近交易记录条数
+    SNAPSHOT_TRADES = 100
+    # 内存中保留的交易记录上限，超出的最旧记录交给 history_overflow_sink
+    TRADE_HISTORY_LIMIT = 10_000
+    # 保留的已平仓位条数；完全平仓的仓位移出 positions，不再参与保证金和每tick扫描
+    CLOSED_POSITIONS_LIMIT = 200
+    
     def __init__(self, initial_balance: float, fee_rate: float, max_position_ratio: float, 
                  max_leverage: int, min_stop_loss_percent: float):
         self.initial_balance = initial_balance
@@ -102,30 +138,298 @@ class SimulatedExecutor:
         self.max_leverage = max_leverage
         self.min_stop_loss_percent = min_stop_loss_percent
         
+        # 账户快照缓存：余额、价格或持仓变化时失效；保证金只随持仓变化，单独缓存
+        self._account_cache: Optional[Account] = None
+        self._account_dirty = True
+        self._margin_used = 0.0
+        # 未平仓位的盈亏聚合量，随保证金一起在持仓变化后重算：
+        # 浮动盈亏 = 多头权重*价格 - 多头金额 + 空头金额 - 空头权重*价格，权重为 Σ amount/entry_price
+        self._long_weight = 0.0
+        self._long_cost = 0.0
+        self._short_weight = 0.0
+        self._short_cost = 0.0
+        self._margin_dirty = True
+        
         self.total_balance = initial_balance
+        
+        # 每个tick检查止损止盈时使用的并行数组，持仓变化后在下一次检查时重建
+        self._pos_ids: List[str] = []
+        self._pos_sl = np.empty(0)
+        self._pos_tp = np.empty(0)
+        self._pos_dir = np.empty(0)
+        self._pos_hits = np.empty(0, dtype=np.int8)
+        self._arrays_dirty = True
+        
+        # 待触发计划按触发价分入四个堆，元素为 (键, 创建顺序)，做最大堆时键取负：
+        # 做多在上穿时触发，触发价高于上一价的在 _long_above（最小堆），其余在 _long_below（最大堆）；
+        # 做空在下穿时触发，触发价低于上一价的在 _short_below（最大堆），其余在 _short_above（最小堆）。
+        # 每个tick只弹出被穿越的堆顶，价格反向移动时计划在同方向的两个堆之间转移
+        self._plan_ids: List[str] = []
+        self._long_above: List[tuple] = []
+        self._long_below: List[tuple] = []
+        self._short_above: List[tuple] = []
+        self._short_below: List[tuple] = []
+        self._plans_dirty = True
+        
+        # 持仓/计划每次变化递增；get_positions/get_plans 的结果按 (版本, 价格) 缓存
+        self._state_version = 0
+        self._positions_view_key = None
+        self._positions_view: List[Dict] = []
+        self._plans_view_version = None
+        self._plans_view: List[Dict] = []
+        
+        # 持仓/计划ID：启动时随机前缀 + 自增计数，不必每次读取系统随机数；
+        # 前缀区分不同运行，恢复出的旧ID恰好同前缀时由 _reserve_ids 把计数推进到其后
+        self._id_prefix = os.urandom(2).hex()
+        self._id_counter = 0
+        
         self.positions: Dict[str, Position] = {}
+        self.closed_positions: deque = deque()
         self.plans: Dict[str, TradingPlan] = {}
-        self.trade_history: List[Dict] = []
+        self.trade_history: deque = deque()
+        self.history_overflow_sink: Optional[Callable[[Dict], None]] = None
         
         self.last_price: Optional[float] = None
         
+        self._snapshot: Optional[ExecutorSnapshot] = None
+        self.publish_snapshot()
+        
         self.on_state_change: Optional[Callable] = None
     
+    @property
+    def total_balance(self) -> float:
+        return self._total_balance
+    
+    @total_balance.setter
+    def total_balance(self, value: float):
+        self._total_balance = value
+        self._account_dirty = True
+    
+    @property
+    def last_price(self) -> Optional[float]:
+        return self._last_price
+    
+    @last_price.setter
+    def last_price(self, value: Optional[float]):
+        self._last_price = value
+        self._account_dirty = True
+    
+    @property
+    def positions(self) -> Dict[str, Position]:
+        return self._positions
+    
+    @positions.setter
+    def positions(self, value: Dict[str, Position]):
+        # 恢复状态时会整体替换字典
+        self._positions = value
+        self._reserve_ids(value)
+        self._arrays_dirty = self._plans_dirty = True
+        self._state_version += 1
+        self._margin_dirty = True
+        self._account_dirty = True
+    
+    @property
+    def closed_positions(self) -> deque:
+        return self._closed_positions
+    
+    @closed_positions.setter
+    def closed_positions(self, value: Iterable[Position]):
+        self._closed_positions = deque(value, maxlen=self.CLOSED_POSITIONS_LIMIT)
+        self._reserve_ids(pos.id for pos in self._closed_positions)
+    
+    @property
+    def trade_history(self) -> deque:
+        return self._trade_history
+    
+    @trade_history.setter
+    def trade_history(self, value: Iterable[Dict]):
+        # 恢复状态时传入的是列表，统一转为定长队列
+        self._trade_history = deque(value, maxlen=self.TRADE_HISTORY_LIMIT)
+        self._reserve_ids(
+            entry.get(key) for entry in self._trade_history for key in ("position_id", "plan_id")
+        )
+    
+    def _record_trade(self, entry: Dict):
+        history = self._trade_history
+        if len(history) == history.maxlen and self.history_overflow_sink:
+            try:
+                self.history_overflow_sink(history[0])
+            except Exception as e:
+                print(f"交易记录转存错误: {e}")
+        history.append(entry)
+    
+    @property
+    def plans(self) -> Dict[str, TradingPlan]:
+        return self._plans
+    
+    @plans.setter
+    def plans(self, value: Dict[str, TradingPlan]):
+        self._plans = value
+        self._reserve_ids(value)
+        self._arrays_dirty = self._plans_dirty = True
+        self._state_version += 1
+    
+    def _rebuild_arrays(self):
+        # 先清标记再取快照：重建期间的增删会在下一次检查时再次重建
+        self._arrays_dirty = False
+        
+        open_positions = [pos for pos in list(self._positions.values()) if pos.status is PositionStatus.OPEN]
+        self._pos_ids = [pos.id for pos in open_positions]
+        self._pos_sl = np.array([pos.stop_loss for pos in open_positions], dtype=np.float64)
+        self._pos_tp = np.array([pos.take_profit for pos in open_positions], dtype=np.float64)
+        self._pos_dir = np.array([pos.dir_sign for pos in open_positions], dtype=np.float64)
+        # 扫描结果缓冲区随快照分配，之后每个tick复用
+        self._pos_hits = np.empty(len(open_positions), dtype=np.int8)
+    
+    def _rebuild_plan_heaps(self, reference_price: float):
+        """以上一价为界重新分堆；计划增删改或触发后调用"""
+        self._plans_dirty = False
+        
+        pending_plans = [plan for plan in list(self._plans.values()) if plan.status is PlanStatus.PENDING]
+        self._plan_ids = [plan.id for plan in pending_plans]
+        long_above, long_below, short_above, short_below = [], [], [], []
+        
+        for index, plan in enumerate(pending_plans):
+            trigger_price = plan.trigger_price
+            if plan.is_long:
+                if trigger_price > reference_price:
+                    long_above.append((trigger_price, index))
+                else:
+                    long_below.append((-trigger_price, index))
+            else:
+                if trigger_price < reference_price:
+                    short_below.append((-trigger_price, index))
+                else:
+                    short_above.append((trigger_price, index))
+        
+        for heap in (long_above, long_below, short_above, short_below):
+            heapq.heapify(heap)
+        self._long_above, self._long_below = long_above, long_below
+        self._short_above, self._short_below = short_above, short_below
+    
+    def _pop_crossed_plans(self, current_price: float) -> List[int]:
+        """弹出本tick被穿越的计划，返回按创建顺序排列的下标"""
+        hits = []
+        
+        heap = self._long_above
+        while heap and heap[0][0] <= current_price:
+            hits.append(heapq.heappop(heap)[1])
+        heap = self._long_below
+        while heap and -heap[0][0] > current_price:
+            key, index = heapq.heappop(heap)
+            heapq.heappush(self._long_above, (-key, index))
+        
+        heap = self._short_below
+        while heap and -heap[0][0] >= current_price:
+            hits.append(heapq.heappop(heap)[1])
+        heap = self._short_above
+        while heap and heap[0][0] < current_price:
+            key, index = heapq.heappop(heap)
+            heapq.heappush(self._short_below, (-key, index))
+        
+        hits.sort()
+        return hits
+    
     def get_account_info(self) -> Account:
-        margin_used = sum(pos.margin_used for pos in self.positions.values())
-        unrealized_pnl = sum(pos.unrealized_pnl(self.last_price) 
-                            for pos in self.positions.values() if self.last_price)
+        if not self._account_dirty and self._account_cache is not None:
+            return self._account_cache
+        
+        self._account_dirty = False
+        if self._margin_dirty:
+            self._recompute_aggregates()
+        
+        # 价格变化时只需几次乘法，不再遍历持仓
+        last_price = self.last_price
+        unrealized_pnl = 0.0
+        if last_price:
+            unrealized_pnl = ((self._long_weight * last_price - self._long_cost)
+                              + (self._short_cost - self._short_weight * last_price))
+            # 聚合相减会留下 1e-13 量级的残差，舍掉以免刚开仓时显示 -0.00
+            unrealized_pnl = round(unrealized_pnl, 8) + 0.0
+        
+        margin_used = self._margin_used
         available = self.total_balance - margin_used
         
-        return Account(
+        self._account_cache = Account(
             total_balance=self.total_balance,
             available=available,
             margin_used=margin_used,
             unrealized_pnl=unrealized_pnl
         )
+        return self._account_cache
+    
+    def _available(self) -> float:
+        """可用资金，只依赖余额和保证金，不需要构造完整的账户快照"""
+        if self._margin_dirty:
+            self._recompute_aggregates()
+        return self.total_balance - self._margin_used
+    
+    def _recompute_aggregates(self):
+        """一次遍历重算保证金和多空盈亏聚合量，只在持仓变化后执行"""
+        self._margin_dirty = False
+        margin_used = long_weight = long_cost = short_weight = short_cost = 0.0
+        
+        for pos in self.positions.values():
+            margin_used += pos.amount / pos.leverage
+            if pos.status is not PositionStatus.OPEN:
+                continue
+            if pos.dir_sign > 0:
+                long_weight += pos.amount / pos.entry_price
+                long_cost += pos.amount
+            else:
+                short_weight += pos.amount / pos.entry_price
+                short_cost += pos.amount
+        
+        self._margin_used = margin_used
+        self._long_weight, self._long_cost = long_weight, long_cost
+        self._short_weight, self._short_cost = short_weight, short_cost
+    
+    def _reserve_ids(self, ids: Iterable[Optional[str]]):
+        """恢复出的ID与本次前缀相同时，把计数推进到其后，新ID不会与已平仓位、计划或成交记录重复"""
+        prefix = self._id_prefix
+        for item_id in ids:
+            if not item_id:
+                continue
+            _, _, tail = item_id.partition("_")
+            if not tail.startswith(prefix):
+                continue
+            try:
+                counter = int(tail[len(prefix):], 16)
+            except ValueError:
+                continue
+            if counter > self._id_counter:
+                self._id_counter = counter
+    
+    def _next_id(self, kind: str, existing: Dict) -> str:
+        while True:
+            self._id_counter += 1
+            new_id = f"{kind}_{self._id_prefix}{self._id_counter:04x}"
+            if new_id not in existing:
+                return new_id
+    
+    def publish_snapshot(self):
+        """复制当前状态并以一次引用赋值发布，读取方拿到的总是完整的一版"""
+        self._snapshot = ExecutorSnapshot(
+            version=self._state_version,
+            total_balance=self.total_balance,
+            positions={pos_id: copy.copy(pos) for pos_id, pos in self.positions.items()},
+            plans={plan_id: copy.copy(plan) for plan_id, plan in self.plans.items()},
+            recent_trades=tuple(islice(reversed(self._trade_history), self.SNAPSHOT_TRADES))[::-1],
+            # 已平仓位不会再被修改，直接引用
+            closed_positions=tuple(self._closed_positions)
+        )
+    
+    def get_snapshot(self) -> ExecutorSnapshot:
+        return self._snapshot
     
     def _trigger_state_change(self):
         """触发状态变化回调"""
+        # 所有修改持仓/计划的操作都会经过这里
+        self._arrays_dirty = self._plans_dirty = True
+        self._state_version += 1
+        self._margin_dirty = True
+        self._account_dirty = True
+        self.publish_snapshot()
         if self.on_state_change:
             try:
                 self.on_state_change()
@@ -134,11 +438,11 @@ class SimulatedExecutor:
     
     def validate_position(self, amount: float, leverage: int, stop_loss: float, 
                          entry_price: float, direction: Direction) -> tuple[bool, str]:
-        account = self.get_account_info()
+        available = self._available()
         margin_needed = amount / leverage
         
-        if margin_needed > account.available:
-            return False, f"可用资金不足: 需要 {margin_needed:.2f}, 可用 {account.available:.2f}"
+        if margin_needed > available:
+            return False, f"可用资金不足: 需要 {margin_needed:.2f}, 可用 {available:.2f}"
         
         if amount > self.total_balance * self.max_position_ratio:
             return False, f"超过单笔最大仓位限制: {self.max_position_ratio*100}%"
@@ -173,7 +477,7 @@ class SimulatedExecutor:
         self.total_balance -= fee
         
         position = Position(
-            id=f"pos_{uuid.uuid4().hex[:8]}",
+            id=self._next_id("pos", self.positions),
             symbol=symbol,
             direction=dir_enum,
             entry_price=current_price,
@@ -181,12 +485,12 @@ class SimulatedExecutor:
             leverage=leverage,
             stop_loss=stop_loss,
             take_profit=take_profit,
-            open_time=datetime.now()
+            open_time=time.time_ns()
         )
         
         self.positions[position.id] = position
-        self.trade_history.append({
-            "timestamp": datetime.now(),
+        self._record_trade({
+            "timestamp": time.time_ns(),
             "type": "open_position",
             "position_id": position.id,
             "direction": direction,
@@ -219,24 +523,23 @@ class SimulatedExecutor:
         close_amount = position.amount * ratio
         fee = close_amount * self.fee_rate
         
-        if position.direction == Direction.LONG:
-            pnl = (current_price - position.entry_price) * close_amount / position.entry_price
-        else:
-            pnl = (position.entry_price - current_price) * close_amount / position.entry_price
+        pnl = position.dir_sign * (current_price - position.entry_price) * close_amount / position.entry_price + 0.0
         
         realized_pnl = pnl - fee
         self.total_balance += realized_pnl
         
         if ratio >= 0.9999:
             position.status = PositionStatus.CLOSED
-            position.close_time = datetime.now()
+            position.close_time = time.time_ns()
             position.close_price = current_price
             position.realized_pnl = realized_pnl
+            del self.positions[position_id]
+            self._closed_positions.append(position)
         else:
             position.amount *= (1 - ratio)
         
-        self.trade_history.append({
-            "timestamp": datetime.now(),
+        self._record_trade({
+            "timestamp": time.time_ns(),
             "type": "close_position",
             "position_id": position_id,
             "close_price": current_price,
@@ -282,7 +585,7 @@ class SimulatedExecutor:
             return {"success": False, "error": msg}
         
         plan = TradingPlan(
-            id=f"plan_{uuid.uuid4().hex[:8]}",
+            id=self._next_id("plan", self.plans),
             symbol=symbol,
             trigger_price=trigger_price,
             direction=dir_enum,
@@ -290,7 +593,7 @@ class SimulatedExecutor:
             leverage=leverage,
             stop_loss=stop_loss,
             take_profit=take_profit,
-            create_time=datetime.now()
+            create_time=time.time_ns()
         )
         
         self.plans[plan.id] = plan
@@ -310,6 +613,8 @@ class SimulatedExecutor:
         for key, value in kwargs.items():
             if hasattr(plan, key) and value is not None:
                 setattr(plan, key, value)
+        # 方向可能被修改，重新计算派生字段
+        plan.__post_init__()
         
         self._trigger_state_change()
         
@@ -327,14 +632,19 @@ class SimulatedExecutor:
         return {"success": True, "message": "计划已取消"}
     
     def get_positions(self) -> List[Dict]:
-        result = []
-        for pos in self.positions.values():
-            if pos.status == PositionStatus.OPEN:
+        if self._arrays_dirty:
+            self._rebuild_arrays()
+        
+        key = (self._state_version, self.last_price)
+        if key != self._positions_view_key:
+            self._positions_view_key = key
+            view = []
+            for position_id in self._pos_ids:
+                pos = self.positions[position_id]
                 unrealized_pnl = pos.unrealized_pnl(self.last_price) if self.last_price else 0
                 pnl_percent = (unrealized_pnl / pos.amount) * 100 if pos.amount > 0 else 0
-                hold_time = (datetime.now() - pos.open_time).total_seconds()
                 
-                result.append({
+                view.append((pos.open_time, {
                     "position_id": pos.id,
                     "symbol": pos.symbol,
                     "direction": pos.direction.value,
@@ -345,16 +655,25 @@ class SimulatedExecutor:
                     "unrealized_pnl": unrealized_pnl,
                     "pnl_percent": pnl_percent,
                     "stop_loss": pos.stop_loss,
-                    "take_profit": pos.take_profit,
-                    "hold_time_seconds": hold_time
-                })
-        return result
+                    "take_profit": pos.take_profit
+                }))
+            self._positions_view = view
+        
+        # 持仓时长随时间变化，每次调用单独补上
+        now = time.time_ns()
+        return [
+            {**entry, "hold_time_seconds": (now - open_time) / 1e9}
+            for open_time, entry in self._positions_view
+        ]
     
     def get_plans(self) -> List[Dict]:
-        result = []
-        for plan in self.plans.values():
-            if plan.status == PlanStatus.PENDING:
-                result.append({
+        if self._plans_view_version != self._state_version:
+            self._plans_view_version = self._state_version
+            view = []
+            for plan in self.plans.values():
+                if plan.status is not PlanStatus.PENDING:
+                    continue
+                view.append({
                     "plan_id": plan.id,
                     "symbol": plan.symbol,
                     "trigger_price": plan.trigger_price,
@@ -363,9 +682,11 @@ class SimulatedExecutor:
                     "leverage": plan.leverage,
                     "stop_loss": plan.stop_loss,
                     "take_profit": plan.take_profit,
-                    "create_time": plan.create_time.isoformat()
+                    "create_time": ns_to_datetime(plan.create_time).isoformat()
                 })
-        return result
+            self._plans_view = view
+        
+        return list(self._plans_view)
     
     def check_and_trigger_plans(self, current_price: float):
         triggered_plans = []
@@ -374,8 +695,17 @@ class SimulatedExecutor:
             self.last_price = current_price
             return triggered_plans
         
-        for plan in list(self.plans.values()):
-            if plan.check_trigger(current_price, self.last_price):
+        if self._plans_dirty:
+            self._rebuild_plan_heaps(self.last_price)
+        
+        if not self._plan_ids:
+            return triggered_plans
+        
+        hits = self._pop_crossed_plans(current_price)
+        
+        for plan_id in [self._plan_ids[index] for index in hits]:
+            plan = self.plans.get(plan_id)
+            if plan is not None and plan.check_trigger(current_price, self.last_price):
                 result = self.open_position(
                     symbol=plan.symbol,
                     direction=plan.direction.value,
@@ -387,6 +717,10 @@ class SimulatedExecutor:
                 )
                 
                 plan.status = PlanStatus.TRIGGERED
+                self._plans_dirty = True
+                self._state_version += 1
+                # open_position 发布快照时计划仍是待触发，状态改完后重新发布
+                self.publish_snapshot()
                 triggered_plans.append({
                     "plan_id": plan.id,
                     "result": result
@@ -397,16 +731,26 @@ class SimulatedExecutor:
     def check_stop_loss_take_profit(self, current_price: float):
         auto_closed = []
         
-        for pos in list(self.positions.values()):
-            if pos.status == PositionStatus.OPEN:
-                trigger = pos.check_stop_loss_take_profit(current_price)
-                if trigger:
-                    result = self.close_position(pos.id, 1.0, current_price)
-                    auto_closed.append({
-                        "position_id": pos.id,
-                        "trigger": trigger,
-                        "result": result
-                    })
+        if self._arrays_dirty:
+            self._rebuild_arrays()
+        
+        if not self._pos_ids:
+            return auto_closed
+        
+        if not scan_sltp(float(current_price), self._pos_sl, self._pos_tp, self._pos_dir, self._pos_hits):
+            return auto_closed
+        
+        hits = self._pos_hits
+        for index in np.flatnonzero(hits):
+            pos = self.positions.get(self._pos_ids[index])
+            if pos is not None and pos.status is PositionStatus.OPEN:
+                trigger = "stop_loss" if hits[index] == HIT_STOP_LOSS else "take_profit"
+                result = self.close_position(pos.id, 1.0, current_price)
+                auto_closed.append({
+                    "position_id": pos.id,
+                    "trigger": trigger,
+                    "result": result
+                })
         
         return auto_closed
     
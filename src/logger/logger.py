@@ -1,9 +1,88 @@
-import json
+import orjson
 import os
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import time
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _dumps(entry: Dict) -> bytes:
+    return orjson.dumps(entry, default=str, option=_JSON_OPTIONS)
+
+class _PassthroughQueueHandler(QueueHandler):
+    """原样入队的处理器
+    
+    默认的 QueueHandler.prepare 会在调用线程里格式化消息和异常堆栈；队列只在进程内使用，
+    记录无需可序列化，直接入队，格式化（时间、堆栈文本）交给监听线程完成。
+    决策/交易记录的消息本身就是序列化好的UTF-8字节，也不能被当作字符串格式化。
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class _AppendFileHandler(logging.Handler):
+    """以追加模式持有文件描述符，直接 os.write 预先编码好的字节
+    
+    由监听线程调用：突发的多条记录先攒在缓冲区，累计 flush_every 条时合并为一次写入；
+    其余情况由 _BatchingQueueListener 在队列取空或距上次写入超过 flush_interval 秒时调用 flush_if_due。
+    """
+    
+    def __init__(self, filename: str, flush_every: int = 64, flush_interval: float = 0.5):
+        super().__init__()
+        # O_BINARY 只在 Windows 上存在，避免换行被转换
+        self.fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0), 0o644)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._buffer: List[bytes] = []
+        self._last_flush = time.monotonic()
+    
+    def emit(self, record: logging.LogRecord):
+        self._buffer.append(record.msg + b"\n")
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+    
+    def flush_if_due(self, idle: bool):
+        """队列已取空，或缓冲最早的记录已等待超过 flush_interval 秒时写入"""
+        if self._buffer and (idle or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+    
+    def flush(self):
+        with self.lock:
+            self._last_flush = time.monotonic()
+            if not self._buffer or self.fd is None:
+                return
+            data = memoryview(b"".join(self._buffer))
+            self._buffer.clear()
+            try:
+                while data:
+                    data = data[os.write(self.fd, data):]
+            except OSError as e:
+                print(f"写入日志失败: {e}")
+    
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+        super().close()
+
+class _BatchingQueueListener(QueueListener):
+    """每处理完一条记录检查各缓冲处理器的写入时机
+    
+    决策记录后面紧跟系统日志时，决策处理器的 emit 不会再被调用，只靠它自己判断会一直留在缓冲区；
+    由监听线程统一检查，保证队列空闲时立即落盘、持续繁忙时最多延迟 flush_interval 秒。
+    """
+    
+    def handle(self, record: logging.LogRecord):
+        super().handle(record)
+        idle = self.queue.empty()
+        for handler in self.handlers:
+            if isinstance(handler, _AppendFileHandler):
+                handler.flush_if_due(idle)
 
 class Logger:
     def __init__(self, log_dir: str = "logs"):
@@ -14,10 +93,14 @@ class Logger:
         self.trade_log_file = os.path.join(log_dir, "trades.log")
         self.system_log_file = os.path.join(log_dir, "system.log")
         
-        self._setup_system_logger()
+        # 所有日志调用只入队，由后台监听线程完成格式化和磁盘写入
+        self.log_queue = queue.SimpleQueue()
+        handlers = self._setup_system_logger() + self._setup_record_loggers()
+        self.listener = _BatchingQueueListener(self.log_queue, *handlers, respect_handler_level=True)
+        self.listener.start()
     
-    def _setup_system_logger(self):
-        """设置系统日志记录器"""
+    def _setup_system_logger(self) -> list:
+        """设置系统日志记录器，返回交给监听线程的实际处理器"""
         self.system_logger = logging.getLogger("system")
         self.system_logger.setLevel(logging.DEBUG)
         
@@ -38,8 +121,37 @@ class Logger:
         handler.setFormatter(formatter)
         console_handler.setFormatter(formatter)
         
-        self.system_logger.addHandler(handler)
-        self.system_logger.addHandler(console_handler)
+        system_filter = logging.Filter("system")
+        handler.addFilter(system_filter)
+        console_handler.addFilter(system_filter)
+        
+        self.system_logger.addHandler(_PassthroughQueueHandler(self.log_queue))
+        return [handler, console_handler]
+    
+    def _setup_record_loggers(self) -> list:
+        """设置决策/交易JSON行日志记录器，与系统日志共用同一队列"""
+        handlers = []
+        self.record_loggers = {}
+        
+        for name, log_file in (("decision", self.decision_log_file), ("trade", self.trade_log_file)):
+            record_logger = logging.getLogger(name)
+            record_logger.setLevel(logging.INFO)
+            record_logger.propagate = False
+            record_logger.addHandler(_PassthroughQueueHandler(self.log_queue))
+            
+            handler = _AppendFileHandler(log_file)
+            handler.addFilter(logging.Filter(name))
+            handlers.append(handler)
+            
+            self.record_loggers[name] = record_logger
+        
+        return handlers
+    
+    def close(self):
+        """停止后台监听线程，写完队列中剩余的日志"""
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.flush()
     
     def log_decision(self, cycle: int, input_data: Dict, agent_output: Dict, 
                     execution_results: list, duration_ms: float):
@@ -53,8 +165,7 @@ class Logger:
             "duration_ms": duration_ms
         }
         
-        with open(self.decision_log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
+        self.record_loggers["decision"].info(_dumps(log_entry))
     
     def log_trade(self, trade_type: str, params: Dict, result: Dict):
         """记录交易日志"""
@@ -65,8 +176,29 @@ class Logger:
             "result": result
         }
         
-        with open(self.trade_log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
+        self.record_loggers["trade"].info(_dumps(log_entry))
+    
+    def log_trades_bulk(self, entries: List[Tuple[str, Dict, Dict]]):
+        """批量记录交易日志
+        
+        entries 为 (trade_type, params, result) 列表。每条仍是独立的一行JSON，
+        但合并为一条日志记录，只入队一次、落盘一次写入。
+        """
+        if not entries:
+            return
+        
+        timestamp = datetime.now().isoformat()
+        lines = [
+            _dumps({
+                "timestamp": timestamp,
+                "type": trade_type,
+                "params": params,
+                "result": result
+            })
+            for trade_type, params, result in entries
+        ]
+        
+        self.record_loggers["trade"].info(b"\n".join(lines))
     
     def info(self, message: str):
         """记录INFO级别日志"""
@@ -76,9 +208,9 @@ class Logger:
         """记录WARNING级别日志"""
         self.system_logger.warning(message)
     
-    def error(self, message: str):
+    def error(self, message: str, exc_info: bool = False):
         """记录ERROR级别日志"""
-        self.system_logger.error(message)
+        self.system_logger.error(message, exc_info=exc_info)
     
     def debug(self, message: str):
         """记录DEBUG级别日志"""
@@ -1,35 +1,81 @@
-import json
+import orjson
 import os
 from datetime import datetime
-from typing import Dict, Any
+from operator import attrgetter
+from typing import Dict, Any, Iterable, List
+
+from src.executor import (
+    Position, TradingPlan, Direction, PositionStatus, PlanStatus, ns_to_datetime, datetime_to_ns
+)
+
+# 状态文件中的字段顺序；attrgetter 在C层一次取出所有属性，枚举和时间字段序列化时再单独转换
+_POS_FIELDS = ("id", "symbol", "direction", "entry_price", "amount", "leverage", "stop_loss",
+               "take_profit", "open_time", "status", "close_time", "close_price", "realized_pnl")
+_POS_GET = attrgetter(*_POS_FIELDS)
+
+_PLAN_FIELDS = ("id", "symbol", "trigger_price", "direction", "amount", "leverage",
+                "stop_loss", "take_profit", "create_time", "status")
+_PLAN_GET = attrgetter(*_PLAN_FIELDS)
+
+# 反序列化时按枚举值直接查表，不经过 Enum.__call__
+_DIRECTION_LOOKUP = {d.value: d for d in Direction}
+_POSITION_STATUS_LOOKUP = {s.value: s for s in PositionStatus}
+_PLAN_STATUS_LOOKUP = {s.value: s for s in PlanStatus}
 
 class StatePersistence:
-    def __init__(self, state_file: str = "data/state.json"):
+    def __init__(self, state_file: str = "data/state.json", pretty: bool = False):
         self.state_file = state_file
+        # 默认输出紧凑JSON，需要人工查看时传 pretty=True 或用 view_state.py
+        self._dump_option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if pretty else 0)
+        # 上次成功落盘时的状态标识，相同则说明内容没有变化，不必重新序列化整个执行器
+        self._last_saved_key = None
         os.makedirs(os.path.dirname(state_file), exist_ok=True)
     
-    def save_state(self, executor, cycle_count: int, alert_manager=None) -> bool:
-        """保存当前状态"""
+    def save_state(self, executor, cycle_count: int, price_alerts: Dict = None) -> bool:
+        """保存当前状态
+        
+        在后台线程中执行，只读取已发布的快照：price_alerts 须由调用方在事件循环中
+        通过 alert_manager.to_dict() 取得，之后不再修改，预警触发时的删除不会与这里的遍历并发。
+        """
         try:
+            snapshot = executor.get_snapshot()
+            alerts_key = tuple((a["id"], a["triggered"]) for a in price_alerts["alerts"]) if price_alerts else None
+            save_key = (snapshot.version, cycle_count, alerts_key)
+            if save_key == self._last_saved_key:
+                return True
+            
             state = {
                 "timestamp": datetime.now().isoformat(),
                 "cycle_count": cycle_count,
                 "executor": {
-                    "total_balance": executor.total_balance,
+                    "total_balance": snapshot.total_balance,
                     "last_price": executor.last_price,
-                    "positions": self._serialize_positions(executor.positions),
-                    "plans": self._serialize_plans(executor.plans),
-                    "trade_history": executor.trade_history[-100:]
+                    "positions": self._serialize_positions(snapshot.positions.values()),
+                    "closed_positions": self._serialize_positions(snapshot.closed_positions),
+                    "plans": self._serialize_plans(snapshot.plans),
+                    "trade_history": self._serialize_trade_history(snapshot.recent_trades)
                 }
             }
             
             # 保存价格预警
-            if alert_manager:
-                state["price_alerts"] = alert_manager.to_dict()
+            if price_alerts:
+                state["price_alerts"] = price_alerts
             
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(state, f, ensure_ascii=False, indent=2, default=str)
+            # 先写临时文件再替换，保存中途崩溃时磁盘上仍是上一份完整状态
+            tmp_file = self.state_file + '.tmp'
+            data = orjson.dumps(state, default=str, option=self._dump_option)
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                # 落盘后再替换，断电时不会留下被截断的状态文件
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(tmp_file, self.state_file)
             
+            self._last_saved_key = save_key
             return True
         except Exception as e:
             print(f"保存状态失败: {e}")
@@ -41,8 +87,8 @@ class StatePersistence:
             return None
         
         try:
-            with open(self.state_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self.state_file, 'rb') as f:
+                return orjson.loads(f.read())
         except Exception as e:
             print(f"加载状态失败: {e}")
             return None
@@ -58,19 +104,23 @@ class StatePersistence:
             executor.total_balance = executor_state.get('total_balance', executor.initial_balance)
             executor.last_price = executor_state.get('last_price')
             
-            executor.positions = self._deserialize_positions(
-                executor_state.get('positions', {})
-            )
+            positions = self._deserialize_positions(executor_state.get('positions', {}))
+            closed_positions = self._deserialize_positions(executor_state.get('closed_positions', {}))
+            # 旧版状态文件中已平仓位和未平仓位混在 positions 里
+            for pos_id in [pos_id for pos_id, pos in positions.items() if pos.status is PositionStatus.CLOSED]:
+                closed_positions[pos_id] = positions.pop(pos_id)
+            
+            executor.positions = positions
+            executor.closed_positions = sorted(closed_positions.values(), key=attrgetter('close_time'))
             
             executor.plans = self._deserialize_plans(
                 executor_state.get('plans', {})
             )
             
+            # 历史成交的时间戳保持ISO字符串，运行中没有地方读取它，保存时原样写回
             executor.trade_history = executor_state.get('trade_history', [])
             
-            for item in executor.trade_history:
-                if 'timestamp' in item and isinstance(item['timestamp'], str):
-                    item['timestamp'] = datetime.fromisoformat(item['timestamp'])
+            executor.publish_snapshot()
             
             # 恢复价格预警
             if alert_manager and callback and 'price_alerts' in state:
@@ -91,45 +141,44 @@ class StatePersistence:
             print(f"恢复状态失败: {e}")
             return 0
     
-    def _serialize_positions(self, positions: Dict) -> Dict:
-        """序列化持仓"""
+    def _serialize_trade_history(self, trade_history: Iterable[Dict]) -> List[Dict]:
+        """序列化交易历史，纳秒时间戳转为ISO字符串，恢复得到的字符串时间戳原样保留"""
+        result = []
+        for item in trade_history:
+            timestamp = item.get('timestamp')
+            if isinstance(timestamp, int):
+                item = {**item, 'timestamp': ns_to_datetime(timestamp).isoformat()}
+            result.append(item)
+        return result
+    
+    def _serialize_positions(self, positions: Iterable) -> Dict:
+        """序列化持仓，按仓位ID组织"""
         result = {}
-        for pos_id, pos in positions.items():
-            result[pos_id] = {
-                "id": pos.id,
-                "symbol": pos.symbol,
-                "direction": pos.direction.value,
-                "entry_price": pos.entry_price,
-                "amount": pos.amount,
-                "leverage": pos.leverage,
-                "stop_loss": pos.stop_loss,
-                "take_profit": pos.take_profit,
-                "open_time": pos.open_time.isoformat(),
-                "status": pos.status.value,
-                "close_time": pos.close_time.isoformat() if pos.close_time else None,
-                "close_price": pos.close_price,
-                "realized_pnl": pos.realized_pnl
-            }
+        for pos in positions:
+            data = dict(zip(_POS_FIELDS, _POS_GET(pos)))
+            data["direction"] = pos.direction.value
+            data["status"] = pos.status.value
+            data["open_time"] = ns_to_datetime(pos.open_time).isoformat()
+            data["close_time"] = ns_to_datetime(pos.close_time).isoformat() if pos.close_time else None
+            result[pos.id] = data
         return result
     
     def _deserialize_positions(self, positions_data: Dict) -> Dict:
         """反序列化持仓"""
-        from src.executor import Position, Direction, PositionStatus
-        
         result = {}
         for pos_id, data in positions_data.items():
             pos = Position(
                 id=data['id'],
                 symbol=data['symbol'],
-                direction=Direction(data['direction']),
+                direction=_DIRECTION_LOOKUP[data['direction']],
                 entry_price=data['entry_price'],
                 amount=data['amount'],
                 leverage=data['leverage'],
                 stop_loss=data['stop_loss'],
                 take_profit=data['take_profit'],
-                open_time=datetime.fromisoformat(data['open_time']),
-                status=PositionStatus(data['status']),
-                close_time=datetime.fromisoformat(data['close_time']) if data['close_time'] else None,
+                open_time=datetime_to_ns(datetime.fromisoformat(data['open_time'])),
+                status=_POSITION_STATUS_LOOKUP[data['status']],
+                close_time=datetime_to_ns(datetime.fromisoformat(data['close_time'])) if data['close_time'] else None,
                 close_price=data['close_price'],
                 realized_pnl=data['realized_pnl']
             )
@@ -140,37 +189,28 @@ class StatePersistence:
         """序列化计划"""
         result = {}
         for plan_id, plan in plans.items():
-            result[plan_id] = {
-                "id": plan.id,
-                "symbol": plan.symbol,
-                "trigger_price": plan.trigger_price,
-                "direction": plan.direction.value,
-                "amount": plan.amount,
-                "leverage": plan.leverage,
-                "stop_loss": plan.stop_loss,
-                "take_profit": plan.take_profit,
-                "create_time": plan.create_time.isoformat(),
-                "status": plan.status.value
-            }
+            data = dict(zip(_PLAN_FIELDS, _PLAN_GET(plan)))
+            data["direction"] = plan.direction.value
+            data["status"] = plan.status.value
+            data["create_time"] = ns_to_datetime(plan.create_time).isoformat()
+            result[plan_id] = data
         return result
     
     def _deserialize_plans(self, plans_data: Dict) -> Dict:
         """反序列化计划"""
-        from src.executor import TradingPlan, Direction, PlanStatus
-        
         result = {}
         for plan_id, data in plans_data.items():
             plan = TradingPlan(
                 id=data['id'],
                 symbol=data['symbol'],
                 trigger_price=data['trigger_price'],
-                direction=Direction(data['direction']),
+                direction=_DIRECTION_LOOKUP[data['direction']],
                 amount=data['amount'],
                 leverage=data['leverage'],
                 stop_loss=data['stop_loss'],
                 take_profit=data['take_profit'],
-                create_time=datetime.fromisoformat(data['create_time']),
-                status=PlanStatus(data['status'])
+                create_time=datetime_to_ns(datetime.fromisoformat(data['create_time'])),
+                status=_PLAN_STATUS_LOOKUP[data['status']]
             )
             result[plan_id] = plan
         return result
\ No newline at end of file
@@ -0,0 +1,130 @@
+import random
+
+import pytest
+
+from src.executor import PlanStatus, PositionStatus, SimulatedExecutor
+from src.persistence import StatePersistence
+
+
+def _executor():
+    return SimulatedExecutor(10000, 0.0005, 0.5, 20, 0.002)
+
+
+def test_new_ids_skip_restored_ids_with_same_prefix(tmp_path):
+    old = _executor()
+    old.update_price(3000.0)
+    closed = old.open_position("ETH", "long", 100, 5, 2900, 3300, 3000.0)["position_id"]
+    old.close_position(closed, 1.0, 3010.0)
+    
+    persistence = StatePersistence(str(tmp_path / "state.json"))
+    assert persistence.save_state(old, 1)
+    
+    restored = _executor()
+    # 模拟新一次运行恰好抽到同一个随机前缀
+    restored._id_prefix = old._id_prefix
+    persistence.restore_executor(restored, persistence.load_state())
+    
+    assert not restored.positions
+    new_position = restored.open_position("ETH", "long", 100, 5, 2900, 3300, 3000.0)["position_id"]
+    assert new_position != closed
+
+
+class _ReferenceExecutor(SimulatedExecutor):
+    """逐个对象检查的原始实现，作为数组/堆触发路径的对照"""
+    
+    def check_and_trigger_plans(self, current_price: float):
+        triggered_plans = []
+        
+        if self.last_price is None:
+            self.last_price = current_price
+            return triggered_plans
+        
+        for plan in list(self.plans.values()):
+            if plan.check_trigger(current_price, self.last_price):
+                result = self.open_position(
+                    symbol=plan.symbol,
+                    direction=plan.direction.value,
+                    amount=plan.amount,
+                    leverage=plan.leverage,
+                    stop_loss=plan.stop_loss,
+                    take_profit=plan.take_profit,
+                    current_price=current_price
+                )
+                plan.status = PlanStatus.TRIGGERED
+                self._trigger_state_change()
+                triggered_plans.append({"plan_id": plan.id, "result": result})
+        
+        return triggered_plans
+    
+    def check_stop_loss_take_profit(self, current_price: float):
+        auto_closed = []
+        
+        for pos in list(self.positions.values()):
+            if pos.status == PositionStatus.OPEN:
+                trigger = pos.check_stop_loss_take_profit(current_price)
+                if trigger:
+                    result = self.close_position(pos.id, 1.0, current_price)
+                    auto_closed.append({"position_id": pos.id, "trigger": trigger, "result": result})
+        
+        return auto_closed
+
+
+def _simulate(executor_class, seed, ticks=1500):
+    rng = random.Random(seed)
+    executor = executor_class(10000, 0.0005, 0.5, 20, 0.002)
+    executor._id_prefix = "0000"
+    price = 3000.0
+    log = []
+    
+    for _ in range(ticks):
+        r = rng.random()
+        if r < 0.05:
+            direction = rng.choice(["long", "short"])
+            sl = price * (0.98 if direction == "long" else 1.02)
+            tp = price * (1.03 if direction == "long" else 0.97)
+            log.append(executor.open_position("ETH", direction, rng.uniform(10, 300),
+                                              rng.randint(1, 10), sl, tp, price))
+        elif r < 0.1:
+            direction = rng.choice(["long", "short"])
+            trigger = price * rng.uniform(0.99, 1.01)
+            sl = trigger * (0.98 if direction == "long" else 1.02)
+            tp = trigger * (1.03 if direction == "long" else 0.97)
+            log.append(executor.create_plan("ETH", trigger, direction, rng.uniform(10, 300),
+                                            rng.randint(1, 10), sl, tp))
+        elif r < 0.12 and executor.positions:
+            position_id = rng.choice(sorted(executor.positions))
+            log.append(executor.modify_position(position_id, stop_loss=price * rng.uniform(0.97, 1.03)))
+        elif r < 0.13 and executor.plans:
+            log.append(executor.cancel_plan(rng.choice(sorted(executor.plans))))
+        elif r < 0.14 and executor.plans:
+            plan_id = rng.choice(sorted(executor.plans))
+            log.append(executor.modify_plan(plan_id, trigger_price=price * rng.uniform(0.99, 1.01)))
+        
+        price *= 1 + rng.gauss(0, 0.002)
+        log.append(executor.update_price(price))
+        log.append([
+            {k: v for k, v in pos.items() if k != "hold_time_seconds"} for pos in executor.get_positions()
+        ])
+        log.append([
+            {k: v for k, v in plan.items() if k != "create_time"} for plan in executor.get_plans()
+        ])
+    
+    account = executor.get_account_info()
+    return log, executor.total_balance, account.margin_used, [t["type"] for t in executor.trade_history]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_trigger_paths_match_reference(seed):
+    log, balance, margin, trades = _simulate(SimulatedExecutor, seed)
+    ref_log, ref_balance, ref_margin, ref_trades = _simulate(_ReferenceExecutor, seed)
+    
+    # 场景中既有计划触发也有止损止盈平仓，两条路径都被覆盖
+    results = [entry for entry in log if isinstance(entry, dict) and "triggered_plans" in entry]
+    assert any(result["triggered_plans"] for result in results)
+    assert any(result["auto_closed_positions"] for result in results)
+    assert len(log) == len(ref_log)
+    for index, (entry, ref_entry) in enumerate(zip(log, ref_log)):
+        assert entry == pytest.approx(ref_entry), index
+    assert trades == ref_trades
+    assert balance == pytest.approx(ref_balance)
+    assert margin == pytest.approx(ref_margin)
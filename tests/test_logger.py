@@ -0,0 +1,43 @@
+import time
+
+import orjson
+
+from src.logger.logger import Logger
+
+
+def _read_lines(path):
+    with open(path, "rb") as f:
+        return [line for line in f.read().splitlines() if line]
+
+
+def test_decision_followed_by_system_record_is_flushed(tmp_path):
+    logger = Logger(str(tmp_path))
+    try:
+        logger.log_decision(1, {"price": 3000}, {"analysis": "hold"}, [], 12.5)
+        logger.info("系统日志紧跟在决策记录之后")
+        
+        flush_interval = logger.listener.handlers[-1].flush_interval
+        deadline = time.monotonic() + flush_interval + 1.0
+        lines = []
+        while time.monotonic() < deadline:
+            lines = _read_lines(logger.decision_log_file)
+            if lines:
+                break
+            time.sleep(0.01)
+        
+        assert len(lines) == 1
+        assert orjson.loads(lines[0])["cycle"] == 1
+    finally:
+        logger.close()
+
+
+def test_bulk_trades_written_as_separate_lines(tmp_path):
+    logger = Logger(str(tmp_path))
+    logger.log_trades_bulk([
+        ("open_position", {"direction": "long"}, {"success": True}),
+        ("close_position", {"position_id": "pos_1"}, {"success": True}),
+    ])
+    logger.close()
+    
+    lines = [orjson.loads(line) for line in _read_lines(logger.trade_log_file)]
+    assert [entry["type"] for entry in lines] == ["open_position", "close_position"]
@@ -0,0 +1,194 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ccxt
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.collector.market_data import DataCollector, IndicatorCalculator, _indicator_columns
+
+
+def test_each_worker_thread_gets_its_own_exchange(tmp_path):
+    collector = DataCollector(cache_dir=str(tmp_path))
+    # 两个任务在屏障处会合，保证分别运行在两个线程上
+    barrier = threading.Barrier(2, timeout=5)
+    
+    def worker(_):
+        exchange = collector.exchange
+        barrier.wait()
+        return exchange, collector.exchange
+    
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        (first, first_again), (second, second_again) = pool.map(worker, range(2))
+    
+    assert first is first_again and second is second_again
+    assert first is not second
+    assert collector.exchange is not first and collector.exchange is not second
+
+def _reference_indicators(df, ma_periods, rsi_period, macd_params):
+    """改写前逐个 calculate_* 的 pandas 实现，作为内核结果的对照"""
+    close, high, low, volume = df['close'], df['high'], df['low'], df['volume']
+    out = {}
+    for p in ma_periods:
+        out[f'MA{p}'] = close.rolling(window=p).mean()
+    for p in ma_periods:
+        out[f'EMA{p}'] = close.ewm(span=p, adjust=False).mean()
+    
+    fast, slow, signal = macd_params
+    macd = close.ewm(span=fast, adjust=False).mean() - close.ewm(span=slow, adjust=False).mean()
+    out['MACD'] = macd
+    out['MACD_signal'] = macd.ewm(span=signal, adjust=False).mean()
+    out['MACD_hist'] = macd - out['MACD_signal']
+    
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=rsi_period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_period).mean()
+    out['RSI'] = 100 - (100 / (1 + gain / loss))
+    
+    middle = close.rolling(window=20).mean()
+    std = close.rolling(window=20).std()
+    upper, lower = middle + std * 2, middle - std * 2
+    out.update(BOLL_middle=middle, BOLL_upper=upper, BOLL_lower=lower,
+               BOLL_width=(upper - lower) / middle * 100,
+               BOLL_position=(close - lower) / (upper - lower) * 100)
+    
+    low_min, high_max = low.rolling(window=9).min(), high.rolling(window=9).max()
+    k = ((close - low_min) / (high_max - low_min) * 100).ewm(com=2, adjust=False).mean()
+    d = k.ewm(com=2, adjust=False).mean()
+    out.update(K=k, D=d, J=3 * k - 2 * d)
+    
+    true_range = pd.concat(
+        [high - low, (high - close.shift()).abs(), (low - close.shift()).abs()], axis=1
+    ).max(axis=1)
+    out['ATR'] = true_range.rolling(window=14).mean()
+    out['ATR_percent'] = out['ATR'] / close * 100
+    
+    direction = np.sign(close.diff()).fillna(0)
+    out['OBV'] = (direction * volume).cumsum()
+    out['VWAP'] = (volume * (high + low + close) / 3).cumsum() / volume.cumsum()
+    for p in (5, 10, 20):
+        out[f'VOL_MA{p}'] = volume.rolling(window=p).mean()
+    out['volume_ratio'] = volume / out['VOL_MA20']
+    
+    typical = (high + low + close) / 3
+    flow = typical * volume
+    change = typical.diff()
+    positive = flow.where(change > 0, 0).rolling(window=14).sum()
+    negative = flow.where(change < 0, 0).rolling(window=14).sum()
+    out['MFI'] = 100 - (100 / (1 + positive / negative))
+    
+    out['HV'] = np.log(close / close.shift(1)).rolling(window=20).std() * np.sqrt(365) * 100
+    return pd.DataFrame(out)
+
+
+def _candles(seed, n=200):
+    rng = np.random.default_rng(seed)
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+    # 偶尔出现平盘，覆盖 OBV/MFI 中价格不变的分支
+    close[rng.random(n) < 0.05] = np.nan
+    close = pd.Series(close).ffill().to_numpy()
+    spread = close * rng.uniform(0.0005, 0.004, n)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='min'),
+        'open': close,
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.uniform(10, 1000, n),
+    })
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_all_indicators_match_pandas(seed):
+    ma_periods, rsi_period, macd_params = [5, 10, 20, 60], 14, [12, 26, 9]
+    df = _candles(seed)
+    
+    result = IndicatorCalculator.calculate_all_indicators(df.copy(), ma_periods, rsi_period, macd_params)
+    expected = _reference_indicators(df, ma_periods, rsi_period, macd_params)
+    
+    for column in _indicator_columns(ma_periods):
+        np.testing.assert_allclose(
+            result[column].to_numpy(), expected[column].to_numpy(),
+            rtol=1e-8, atol=1e-8, equal_nan=True, err_msg=column
+        )
+
+
+def test_ratio_tail_matches_full_result_on_last_rows():
+    df = _candles(7)
+    
+    full = IndicatorCalculator.calculate_all_indicators(df.copy())
+    tail = IndicatorCalculator.calculate_all_indicators(df.copy(), ratio_tail=2)
+    
+    pd.testing.assert_frame_equal(tail.iloc[-2:], full.iloc[-2:])
+
+
+class _StubExchange:
+    """按当前时间生成 1m K线，fetch_ohlcv 的 since/limit 语义与交易所一致"""
+    
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+    
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+        self.fail = False
+        self.since_calls = []
+    
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.since_calls.append(since)
+        if self.fail:
+            raise ccxt.NetworkError("offline")
+        step = self.parse_timeframe(timeframe) * 1000
+        newest = self.now_ms // step * step
+        start = newest - (limit - 1) * step if since is None else since
+        times = range(start, min(newest, start + (limit - 1) * step) + 1, step)
+        return [[t, 1.0, 1.0, 1.0, 1.0, 1.0] for t in times]
+
+
+def test_incremental_fetch_after_long_gap_returns_newest_bars(tmp_path):
+    collector = DataCollector(cache_dir=str(tmp_path))
+    now_ms = int(time.time() * 1000)
+    exchange = _StubExchange(now_ms - 500 * 60_000)
+    collector._local.exchange = exchange
+    
+    assert collector.get_ohlcv("ETH/USDT", "1m", limit=200) is not None
+    
+    # 断网期间走磁盘缓存，恢复时已过去 500 根K线，超过一次增量拉取的 limit
+    exchange.fail = True
+    collector.get_ohlcv("ETH/USDT", "1m", limit=200)
+    exchange.fail = False
+    exchange.now_ms = now_ms
+    df = collector.get_ohlcv("ETH/USDT", "1m", limit=200)
+    
+    assert len(df) == 200
+    assert df['timestamp'].iloc[-1].value // 1_000_000 == now_ms // 60_000 * 60_000
+
+
+def test_incremental_fetch_gap_larger_than_limit_without_failure(tmp_path):
+    collector = DataCollector(cache_dir=str(tmp_path))
+    now_ms = int(time.time() * 1000)
+    exchange = _StubExchange(now_ms - 500 * 60_000)
+    collector._local.exchange = exchange
+    collector.get_ohlcv("ETH/USDT", "1m", limit=200)
+    
+    exchange.now_ms = now_ms
+    df = collector.get_ohlcv("ETH/USDT", "1m", limit=200)
+    
+    assert df['timestamp'].iloc[-1].value // 1_000_000 == now_ms // 60_000 * 60_000
+    assert df['timestamp'].is_monotonic_increasing and df['timestamp'].diff().dropna().nunique() == 1
+
+
+def test_short_gap_uses_incremental_fetch(tmp_path):
+    collector = DataCollector(cache_dir=str(tmp_path))
+    now_ms = int(time.time() * 1000)
+    exchange = _StubExchange(now_ms - 3 * 60_000)
+    collector._local.exchange = exchange
+    collector.get_ohlcv("ETH/USDT", "1m", limit=200)
+    
+    exchange.now_ms = now_ms
+    exchange.since_calls.clear()
+    df = collector.get_ohlcv("ETH/USDT", "1m", limit=200)
+    
+    assert len(exchange.since_calls) == 1 and exchange.since_calls[0] is not None
+    assert len(df) == 200
+    assert df['timestamp'].iloc[-1].value // 1_000_000 == now_ms // 60_000 * 60_000
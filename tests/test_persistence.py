@@ -0,0 +1,74 @@
+import os
+
+from src.collector.price_alert import PriceAlertManager
+from src.executor import SimulatedExecutor
+from src.persistence import StatePersistence
+
+
+def _executor():
+    return SimulatedExecutor(10000, 0.0005, 0.5, 20, 0.002)
+
+
+def _trade(executor):
+    executor.update_price(3000.0)
+    kept = executor.open_position("ETH", "long", 200, 5, 2900, 3300, 3000.0)["position_id"]
+    closed = executor.open_position("ETH", "short", 100, 3, 3100, 2800, 3000.0)["position_id"]
+    executor.close_position(closed, 1.0, 2990.0)
+    executor.create_plan("ETH", 3050.0, "long", 150, 4, 2950, 3300)
+    executor.update_price(3010.0)
+    return kept, closed
+
+
+def _noop(alert, price):
+    pass
+
+
+def _without(items, key):
+    """持有时长/创建时间随读取时刻变化，且ISO时间只保留到微秒，比较时去掉"""
+    return [{k: v for k, v in item.items() if k != key} for item in items]
+
+
+def test_save_and_restore_round_trip(tmp_path):
+    persistence = StatePersistence(str(tmp_path / "state.json"))
+    executor = _executor()
+    kept, closed = _trade(executor)
+    alerts = PriceAlertManager()
+    alerts.create_alert(3200.0, "above", _noop, "突破")
+    
+    assert persistence.save_state(executor, 7, alerts.to_dict())
+    
+    restored = _executor()
+    restored_alerts = PriceAlertManager()
+    cycle = persistence.restore_executor(restored, persistence.load_state(), restored_alerts, _noop)
+    
+    assert cycle == 7
+    assert restored.total_balance == executor.total_balance
+    assert restored.last_price == executor.last_price
+    assert list(restored.positions) == [kept]
+    assert [pos.id for pos in restored.closed_positions] == [closed]
+    assert _without(restored.get_positions(), "hold_time_seconds") == \
+        _without(executor.get_positions(), "hold_time_seconds")
+    assert _without(restored.get_plans(), "create_time") == _without(executor.get_plans(), "create_time")
+    assert [trade["type"] for trade in restored.trade_history] == [
+        trade["type"] for trade in executor.trade_history
+    ]
+    assert restored.get_account_info() == executor.get_account_info()
+    assert [a["price"] for a in restored_alerts.get_active_alerts()] == [3200.0]
+
+
+def test_unchanged_state_is_not_rewritten(tmp_path):
+    state_file = tmp_path / "state.json"
+    persistence = StatePersistence(str(state_file))
+    executor = _executor()
+    _trade(executor)
+    alerts = PriceAlertManager()
+    
+    assert persistence.save_state(executor, 1, alerts.to_dict())
+    os.remove(state_file)
+    assert persistence.save_state(executor, 1, alerts.to_dict())
+    assert not state_file.exists()
+    
+    alerts.create_alert(3500.0, "above", _noop)
+    assert persistence.save_state(executor, 1, alerts.to_dict())
+    assert state_file.exists()
+    assert not os.path.exists(str(state_file) + ".tmp")
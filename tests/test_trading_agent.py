@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.agent.trading_agent import TradingAgent
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def _tool_delta(index, call_id=None, name=None, arguments=None):
+    return SimpleNamespace(
+        index=index,
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+class _FakeCompletions:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+    
+    async def create(self, **kwargs):
+        async def stream():
+            for chunk in self.chunks:
+                yield chunk
+            if self.error:
+                raise self.error
+        return stream()
+
+
+def _make_agent(chunks, error=None):
+    agent = TradingAgent(api_key="test", system_prompt="system")
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=_FakeCompletions(chunks, error)))
+    return agent
+
+
+async def _decide(agent, on_tool_call=None):
+    try:
+        return await agent.make_decision("market", (), 3000.0, on_tool_call=on_tool_call)
+    finally:
+        await agent.close()
+
+
+def test_tool_call_assembled_from_fragments():
+    chunks = [
+        _chunk(content="看多"),
+        _chunk(tool_calls=[_tool_delta(0, "call_1", "open_", '{"direction": ')]),
+        _chunk(tool_calls=[_tool_delta(0, None, "position", '"long", "margin": 100}')]),
+        _chunk(tool_calls=[_tool_delta(1, "call_2", "create_plan", "{")]),
+        _chunk(tool_calls=[_tool_delta(1, None, None, '"trigger_price": 3100}')]),
+    ]
+    emitted = []
+    
+    decision = asyncio.run(_decide(_make_agent(chunks), emitted.append))
+    
+    assert "error" not in decision
+    assert decision["analysis"] == "看多"
+    assert decision["tool_calls"] == [
+        {"id": "call_1", "name": "open_position",
+         "arguments": {"direction": "long", "margin": 100, "current_price": 3000.0}},
+        {"id": "call_2", "name": "create_plan", "arguments": {"trigger_price": 3100}},
+    ]
+    assert emitted == decision["tool_calls"]
+
+
+def test_invalid_arguments_reported_as_parse_error():
+    chunks = [_chunk(tool_calls=[_tool_delta(0, "call_1", "close_position", '{"position_id": ')])]
+    
+    decision = asyncio.run(_decide(_make_agent(chunks)))
+    
+    assert len(decision["tool_calls"]) == 1
+    assert "解析工具参数失败" in decision["tool_calls"][0]["error"]
+
+
+def test_stream_failure_keeps_already_emitted_tool_calls():
+    chunks = [
+        _chunk(content="先开仓"),
+        _chunk(tool_calls=[_tool_delta(0, "call_1", "open_position", '{"direction": "long"}')]),
+    ]
+    emitted = []
+    
+    decision = asyncio.run(_decide(_make_agent(chunks, ConnectionError("stream reset")), emitted.append))
+    
+    assert decision["error"] == "stream reset"
+    assert decision["analysis"] == "先开仓"
+    assert len(emitted) == 1
+    assert decision["tool_calls"] == emitted
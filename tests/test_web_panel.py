@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import orjson
+from starlette.testclient import TestClient
+
+from src.web import WebPanel
+
+
+def _apply_patch(doc, ops):
+    """按页面 applyPatch 的规则应用 add/remove/replace"""
+    for op in ops:
+        keys = op["path"].split("/")[1:]
+        last = keys.pop()
+        parent = doc
+        for key in keys:
+            parent = parent[key]
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if op["op"] == "add":
+                parent.insert(index, op["value"])
+            elif op["op"] == "remove":
+                parent.pop(index)
+            else:
+                parent[index] = op["value"]
+        elif op["op"] == "remove":
+            del parent[last]
+        else:
+            parent[last] = op["value"]
+
+
+def _apply_message(state, message):
+    for item in message.get("batch", [message]):
+        if "patch" in item:
+            _apply_patch(state, item["patch"])
+        else:
+            state = item
+    return state
+
+
+def _expected(panel):
+    return orjson.loads(orjson.dumps(panel._push_snapshot(), default=list))
+
+
+def _mutate(panel, i):
+    panel.update_account({"equity": i, "total_balance": i})
+    panel.update_positions([{"id": f"pos_{i}", "pnl": i, "pnl_percent": -i}])
+    if i % 3 == 0:
+        panel.add_decision({"analysis": str(i)})
+    panel.update_system_status(cycle=i)
+
+
+def test_websocket_patches_reproduce_state():
+    panel = WebPanel()
+    for i in range(20):
+        panel.add_decision({"analysis": f"pre {i}"})
+    
+    async def step(i):
+        _mutate(panel, i)
+        if i % 7 == 0:
+            await asyncio.sleep(0.02)
+    
+    with TestClient(panel.app) as client:
+        with client.websocket_connect("/ws") as ws:
+            state = orjson.loads(ws.receive_bytes())
+            for i in range(60):
+                client.portal.call(step, i)
+            client.portal.call(panel.flush_updates)
+            expected = _expected(panel)
+            
+            deadline = time.monotonic() + 2
+            while state != expected and time.monotonic() < deadline:
+                state = _apply_message(state, orjson.loads(ws.receive_bytes()))
+    
+    assert state == expected
+    assert len(state["decisions"]) == WebPanel.PUSH_DECISIONS
+
+
+def test_full_send_queue_is_replaced_by_snapshot():
+    panel = WebPanel()
+    send_queue = asyncio.Queue(maxsize=panel.SEND_QUEUE_SIZE)
+    panel.active_connections[object()] = send_queue
+    state = _expected(panel)
+    
+    async def flood():
+        for i in range(panel.SEND_QUEUE_SIZE * 2):
+            _mutate(panel, i)
+            await panel.flush_updates()
+    
+    asyncio.run(flood())
+    
+    while not send_queue.empty():
+        state = _apply_message(state, orjson.loads(send_queue.get_nowait()))
+    assert state == _expected(panel)
+
+
+def test_api_state_etag():
+    panel = WebPanel()
+    with TestClient(panel.app) as client:
+        first = client.get("/api/state")
+        assert client.get("/api/state", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+        panel.update_system_status(status="running")
+        second = client.get("/api/state", headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 200
+        assert second.json()["system_status"]["status"] == "running"
@@ -33,6 +33,9 @@ def main():
                   f"${pos['amount']:.2f} @ {pos['leverage']}x "
                   f"(入场: ${pos['entry_price']:.2f})")
     
+    closed_positions = executor_state.get('closed_positions', {})
+    print(f"已平仓位: {len(closed_positions)}")
+    
     plans = executor_state.get('plans', {})
     print(f"\n计划数量: {len(plans)}")
     if plans: